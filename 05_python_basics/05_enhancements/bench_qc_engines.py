@@ -0,0 +1,53 @@
+"""
+Benchmark the two window_level_qc rendering engines (matplotlib vs NumPy mosaic).
+
+Usage:
+  python 05_python_basics/05_enhancements/bench_qc_engines.py --shape 512 512 300 --repeats 5
+
+A synthetic int16 volume is written to a temporary .npy (read lazily, as in the real script);
+each engine renders the same 4x4 panel and the median wall time per panel is reported.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from window_level_qc import render_panel
+
+
+def _synthetic_volume(shape) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    vol = rng.normal(40, 300, size=shape).astype(np.int16)
+    return np.asfortranarray(vol)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--shape', type=int, nargs=3, default=[512, 512, 300], metavar=('H', 'W', 'Z'))
+    ap.add_argument('--repeats', type=int, default=5)
+    ap.add_argument('--rows', type=int, default=4)
+    ap.add_argument('--cols', type=int, default=4)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        in_vol = os.path.join(tmp, 'bench_volume.npy')
+        np.save(in_vol, _synthetic_volume(tuple(args.shape)))
+        times = {}
+        for engine in ('matplotlib', 'mosaic'):
+            out_png = os.path.join(tmp, f'panel_{engine}.png')
+            render_panel(in_vol, out_png, rows=args.rows, cols=args.cols, engine=engine)  # warm-up
+            runs = []
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                render_panel(in_vol, out_png, rows=args.rows, cols=args.cols, engine=engine)
+                runs.append(time.perf_counter() - t0)
+            times[engine] = statistics.median(runs)
+            print(f'{engine:<10} median {times[engine]*1000:8.1f} ms/panel  '
+                  f'png {os.path.getsize(out_png)/1024:7.0f} KiB')
+    print(f"Speed-up (matplotlib / mosaic): {times['matplotlib'] / times['mosaic']:.1f}x")
+
+if __name__ == '__main__':
+    main()
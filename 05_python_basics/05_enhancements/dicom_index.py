@@ -0,0 +1,188 @@
+"""
+DICOM indexer: scan a directory tree once, group files by Study/SeriesInstanceUID and keep a
+persistent SQLite index of file paths, slice positions and key tags (including
+RescaleSlope/Intercept, so --int16 loads need no extra header reads).
+
+Usage (from repo root):
+  python 05_python_basics/05_enhancements/dicom_index.py \
+      --root path/to/pacs_export --db path/to/dicom_index.sqlite --list
+
+  # then load one series without walking the tree again
+  python 05_python_basics/05_enhancements/dicom_series_loader.py \
+      --index path/to/dicom_index.sqlite --series_uid 1.2.840... --out_np ct_volume.npy
+
+Notes:
+- Re-scans are incremental: only files whose mtime or size changed are re-read; files under
+  --root that disappeared are dropped from the index, so rescanning one subfolder leaves
+  the rest of the index alone.
+- Non-DICOM files are recorded too (is_dicom=0) so they are not re-read on every scan.
+- Headers are read with dicom_series_loader's header-only reader (no pixel data).
+"""
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dicom_series_loader import _read_header, _rescale, _slice_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    is_dicom INTEGER NOT NULL,
+    study_uid TEXT,
+    series_uid TEXT,
+    sop_uid TEXT,
+    modality TEXT,
+    series_number INTEGER,
+    series_description TEXT,
+    instance_number INTEGER,
+    slice_pos REAL,
+    rows INTEGER,
+    cols INTEGER,
+    rescale_slope REAL,
+    rescale_intercept REAL
+);
+CREATE INDEX IF NOT EXISTS idx_files_series ON files (series_uid, slice_pos);
+"""
+
+
+# columns added after the first schema: older indexes get them as NULL, and their DICOM rows
+# are marked stale so the next build_index re-reads them
+_ADDED_COLUMNS = {'rescale_slope': 'REAL', 'rescale_intercept': 'REAL'}
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(str(db_path))
+    con.executescript(_SCHEMA)
+    have = {r[1] for r in con.execute('PRAGMA table_info(files)')}
+    with con:
+        for name, kind in _ADDED_COLUMNS.items():
+            if name not in have:
+                con.execute(f'ALTER TABLE files ADD COLUMN {name} {kind}')
+                con.execute('UPDATE files SET mtime = -1 WHERE is_dicom = 1')
+    return con
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except Exception:
+        return None
+
+
+def _row(path: str, st: os.stat_result, ds) -> tuple:
+    """Build one index row from a file's stat and header (ds is None for non-DICOM files)."""
+    if ds is None:
+        return (path, st.st_mtime, st.st_size, 0) + (None,) * 12
+    return (
+        path, st.st_mtime, st.st_size, 1,
+        str(getattr(ds, 'StudyInstanceUID', '')),
+        str(getattr(ds, 'SeriesInstanceUID', '')),
+        str(ds.SOPInstanceUID),
+        str(getattr(ds, 'Modality', '')),
+        _int_or_none(getattr(ds, 'SeriesNumber', None)),
+        str(getattr(ds, 'SeriesDescription', '')),
+        _int_or_none(getattr(ds, 'InstanceNumber', None)),
+        _slice_key(ds),
+        _int_or_none(getattr(ds, 'Rows', None)),
+        _int_or_none(getattr(ds, 'Columns', None)),
+        *_rescale(ds),
+    )
+
+
+def build_index(root: Path, db_path: Path, workers: Optional[int] = None) -> Dict[str, int]:
+    """Scan root and update the index at db_path. Returns counts of added/updated/removed/unchanged."""
+    con = _connect(db_path)
+    known = {p: (m, s) for p, m, s in con.execute('SELECT path, mtime, size FROM files')}
+    root = root.resolve()
+
+    stats: Dict[str, os.stat_result] = {}
+    for p in root.rglob('*'):
+        if p.is_file():
+            stats[str(p.resolve())] = p.stat()
+
+    todo = [p for p, st in stats.items() if known.get(p) != (st.st_mtime, st.st_size)]
+    # only files under root can have disappeared: rescanning a subfolder keeps its siblings
+    removed = [p for p in known if p not in stats and Path(p).is_relative_to(root)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        headers = list(pool.map(_read_header, todo))
+
+    with con:
+        con.executemany('DELETE FROM files WHERE path = ?', [(p,) for p in removed])
+        con.executemany(
+            'INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)',
+            [_row(p, stats[p], ds) for p, ds in zip(todo, headers)],
+        )
+    con.close()
+    n_new = sum(1 for p in todo if p not in known)
+    return {
+        'added': n_new,
+        'updated': len(todo) - n_new,
+        'removed': len(removed),
+        'unchanged': len(stats) - len(todo),
+    }
+
+
+def list_series(db_path: Path) -> List[dict]:
+    """One record per series: study/series UIDs, modality, description and slice count."""
+    con = _connect(db_path)
+    cur = con.execute(
+        'SELECT study_uid, series_uid, modality, series_number, series_description, COUNT(*) '
+        'FROM files WHERE is_dicom = 1 '
+        'GROUP BY study_uid, series_uid ORDER BY study_uid, series_number'
+    )
+    keys = ['study_uid', 'series_uid', 'modality', 'series_number', 'series_description', 'n_files']
+    out = [dict(zip(keys, r)) for r in cur]
+    con.close()
+    return out
+
+
+def series_files(db_path: Path, series_uid: str) -> List[Path]:
+    """File paths of one series, sorted by slice position (same order as load_series)."""
+    con = _connect(db_path)
+    cur = con.execute(
+        'SELECT path FROM files WHERE is_dicom = 1 AND series_uid = ? ORDER BY slice_pos, path',
+        (series_uid,),
+    )
+    out = [Path(r[0]) for r in cur]
+    con.close()
+    return out
+
+
+def series_rescale(db_path: Path, series_uid: str) -> List[Tuple[Path, Optional[float], Optional[float]]]:
+    """(path, RescaleSlope, RescaleIntercept) per file of one series, in series_files order.
+
+    Slope/intercept are None for rows indexed before these columns existed.
+    """
+    con = _connect(db_path)
+    cur = con.execute(
+        'SELECT path, rescale_slope, rescale_intercept FROM files '
+        'WHERE is_dicom = 1 AND series_uid = ? ORDER BY slice_pos, path',
+        (series_uid,),
+    )
+    out = [(Path(p), s, i) for p, s, i in cur]
+    con.close()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Index a DICOM tree by Study/SeriesInstanceUID')
+    ap.add_argument('--root', required=True, type=str)
+    ap.add_argument('--db', required=True, type=str, help='SQLite index file (created if missing)')
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--list', action='store_true', help='Print the series found after scanning')
+    args = ap.parse_args()
+
+    counts = build_index(Path(args.root), Path(args.db), workers=args.workers)
+    print('Index updated:', ', '.join(f'{k}={v}' for k, v in counts.items()))
+    if args.list:
+        for s in list_series(Path(args.db)):
+            print(f"{s['study_uid']}  {s['series_uid']}  {s['modality']:<3} "
+                  f"#{s['series_number']}  n={s['n_files']:<5} {s['series_description']}")
+
+if __name__ == '__main__':
+    main()
@@ -6,15 +6,27 @@ Usage (from repo root):
   python 05_python_basics/05_enhancements/dicom_series_loader.py \
       --dicom_dir path/to/series_folder \
       --out_np 05_python_basics/figures/ct_volume.npy \
-      --out_nii 05_python_basics/figures/ct_volume.nii.gz
+      --out_nii 05_python_basics/figures/ct_volume.nii.gz \
+      --workers 8
 
 Notes:
+- Loading is two-phase: headers are read first (no pixel data) to filter and sort slices,
+  then pixels are decoded in parallel and written straight into a preallocated HxWxZ array.
+- --executor thread (default) suits uncompressed series; use process for compressed
+  transfer syntaxes where decoding is CPU-bound.
+- --index/--series_uid load one series from a dicom_index.py index without rescanning;
+  --series_uid alone filters a --dicom_dir scan to that series.
 - Sorting prefers ImagePositionPatient with ImageOrientationPatient; falls back to InstanceNumber.
+- Slices are rescaled in place into one preallocated buffer (no per-slice float32 copy, no
+  np.stack); with --out_np that buffer is a memory-mapped .npy, so peak RAM stays near one slice.
+- --int16 keeps int16 HU when RescaleSlope/Intercept are integral (half the float32 memory).
 - HU conversion is attempted for CT if RescaleSlope/Intercept and (0028,1052)/(1053) exist.
 - NIfTI affine is constructed from IOP + PixelSpacing + slice spacing estimate.
 """
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List, Tuple, Optional
 
@@ -55,17 +67,42 @@ def _slice_key(ds) -> float:
     return 0.0
 
 
-def _to_hu(pixel_array: np.ndarray, ds) -> np.ndarray:
-    """Convert to Hounsfield Units if possible (CT)."""
-    arr = pixel_array.astype(np.float32)
-    slope = getattr(ds, 'RescaleSlope', 1.0)
-    intercept = getattr(ds, 'RescaleIntercept', 0.0)
-    # Some vendors store in (0028,1052/1053) WindowCenter/Width, not needed here
+def _rescale(ds) -> Tuple[float, float]:
+    """RescaleSlope/Intercept as floats; identity if missing or unparsable."""
     try:
-        arr = arr * float(slope) + float(intercept)
+        return float(getattr(ds, 'RescaleSlope', 1.0)), float(getattr(ds, 'RescaleIntercept', 0.0))
     except Exception:
-        pass
-    return arr
+        return 1.0, 0.0
+
+
+def _rescale_is_integral(ds) -> bool:
+    slope, intercept = _rescale(ds)
+    return slope.is_integer() and intercept.is_integer()
+
+
+def _to_hu(pixel_array: np.ndarray, ds, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Convert to Hounsfield Units if possible (CT).
+
+    If out is given (a float32 or int16 slice view), the result is written into it in place
+    instead of allocating a float32 copy. Integer outputs require an integral slope/intercept.
+    """
+    slope, intercept = _rescale(ds)
+    # Some vendors store in (0028,1052/1053) WindowCenter/Width, not needed here
+    if out is None:
+        out = np.empty(pixel_array.shape, dtype=np.float32)
+    if np.issubdtype(out.dtype, np.integer):
+        if not _rescale_is_integral(ds):
+            raise ValueError(f"Non-integral rescale ({slope}, {intercept}); cannot store as {out.dtype}")
+        hu = pixel_array.astype(np.int32) * int(slope) + int(intercept)
+        info = np.iinfo(out.dtype)
+        if hu.min() < info.min or hu.max() > info.max:
+            raise ValueError(f"HU values out of {out.dtype} range")
+        out[...] = hu
+        return out
+    out[...] = pixel_array
+    out *= slope
+    out += intercept
+    return out
 
 
 def _get_affine(first, last, nslices) -> Optional[np.ndarray]:
@@ -100,42 +137,148 @@ def _get_affine(first, last, nslices) -> Optional[np.ndarray]:
         return None
 
 
-def load_series(dicom_dir: Path) -> Tuple[np.ndarray, Optional[np.ndarray]]:
-    files = [p for p in dicom_dir.rglob('*') if p.is_file()]
-    dsets = []
-    for f in files:
-        try:
-            ds = pydicom.dcmread(str(f), stop_before_pixels=False, force=True)
-            if hasattr(ds, 'SOPInstanceUID'):
-                dsets.append(ds)
-        except Exception:
-            continue
-    if not dsets:
-        raise RuntimeError("No DICOM slices found.")
-    dsets.sort(key=_slice_key)
-    # Stack
-    vol_list = []
-    for ds in dsets:
-        arr = ds.pixel_array
-        arr = _to_hu(arr, ds)
-        vol_list.append(arr)
-    vol = np.stack(vol_list, axis=-1)  # HxWxZ
-    affine = _get_affine(dsets[0], dsets[-1], len(dsets))
+def _read_header(path: str):
+    """Read a DICOM header only (no pixel data). Returns None for non-image files."""
+    try:
+        ds = pydicom.dcmread(path, stop_before_pixels=True, force=True)
+    except Exception:
+        return None
+    if not hasattr(ds, 'SOPInstanceUID'):
+        return None
+    return ds
+
+
+def _read_slice(path: str, out: Optional[np.ndarray] = None, dtype=np.float32) -> np.ndarray:
+    """Read one file with pixels and return the rescaled 2D slice (written into out if given)."""
+    ds = pydicom.dcmread(path, force=True)
+    if out is None:
+        out = np.empty((int(ds.Rows), int(ds.Columns)), dtype=dtype)
+    return _to_hu(ds.pixel_array, ds, out=out)
+
+
+def read_headers(files: List[Path], workers: Optional[int] = None) -> List[Tuple[Path, object]]:
+    """Phase 1: read headers in parallel, keep DICOM image files, sort by slice position."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        headers = list(pool.map(_read_header, [str(f) for f in files]))
+    pairs = [(f, ds) for f, ds in zip(files, headers) if ds is not None]
+    pairs.sort(key=lambda p: _slice_key(p[1]))
+    return pairs
+
+
+def read_pixels(paths: List[Path], shape: Tuple[int, int], workers: Optional[int] = None,
+                executor: str = 'thread', dtype=np.float32,
+                out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Phase 2: decode slices in parallel into a preallocated HxWxZ array.
+
+    out may be any HxWxZ buffer (e.g. a memory-mapped .npy); by default a Fortran-ordered
+    array is allocated so that each slice is one contiguous block.
+    """
+    vol = out if out is not None else np.empty((shape[0], shape[1], len(paths)), dtype=dtype, order='F')
+    if executor == 'process':
+        # Slices come back pickled; write each into place as it arrives
+        read = partial(_read_slice, dtype=vol.dtype)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for k, arr in enumerate(pool.map(read, [str(p) for p in paths])):
+                vol[..., k] = arr
+    elif executor == 'thread':
+        def _fill(k: int, path: Path):
+            _read_slice(str(path), out=vol[..., k])
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_fill, range(len(paths)), paths))
+    else:
+        raise ValueError("executor must be 'thread' or 'process'")
+    return vol
+
+
+def load_series(dicom_dir: Optional[Path] = None, workers: Optional[int] = None,
+                executor: str = 'thread', series_uid: Optional[str] = None,
+                index: Optional[Path] = None, out_np: Optional[Path] = None,
+                int16: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Load one series as an HxWxZ volume plus affine.
+
+    With index (see dicom_index.py) the series is looked up by series_uid without walking
+    the filesystem; otherwise dicom_dir is scanned and, if given, filtered to series_uid.
+    With out_np the volume is written straight into a memory-mapped .npy at that path.
+    With int16 the volume is kept as int16 HU when slope/intercept are integral.
+    """
+    if index is not None:
+        from dicom_index import series_files
+        if not series_uid:
+            raise ValueError("series_uid is required when loading from an index")
+        paths = series_files(index, series_uid)
+        if not paths:
+            raise RuntimeError(f"Series {series_uid} not found in index {index}")
+        # Index rows are already sorted by slice position; only first/last headers are needed
+        first, last = _read_header(str(paths[0])), _read_header(str(paths[-1]))
+        if first is None or last is None:
+            raise RuntimeError("Index is stale; re-run dicom_index.py")
+    else:
+        files = [p for p in dicom_dir.rglob('*') if p.is_file()]
+        pairs = read_headers(files, workers=workers)
+        if series_uid:
+            pairs = [(p, ds) for p, ds in pairs if getattr(ds, 'SeriesInstanceUID', None) == series_uid]
+        if not pairs:
+            raise RuntimeError("No DICOM slices found.")
+        uids = {getattr(ds, 'SeriesInstanceUID', None) for _, ds in pairs}
+        if len(uids) > 1:
+            print(f'[Warning] {len(uids)} series found in {dicom_dir}; stacking all. '
+                  'Use --series_uid or dicom_index.py to select one.')
+        paths = [p for p, _ in pairs]
+        first, last = pairs[0][1], pairs[-1][1]
+    dtype = np.float32
+    if int16:
+        if index is not None:
+            # every slice's slope/intercept comes from the index; rows from an index built
+            # before those columns existed fall back to reading the header
+            from dicom_index import series_rescale
+            rescale = [(s, i) if s is not None else _rescale(_read_header(str(p)))
+                       for p, s, i in series_rescale(index, series_uid)]
+        else:
+            rescale = [_rescale(ds) for _, ds in pairs]
+        if all(float(s).is_integer() and float(i).is_integer() for s, i in rescale):
+            dtype = np.int16
+        else:
+            print('[Warning] Non-integral RescaleSlope/Intercept; keeping float32.')
+    shape = (int(first.Rows), int(first.Columns))
+    out = None
+    if out_np is not None:
+        out = np.lib.format.open_memmap(str(out_np), mode='w+', dtype=dtype,
+                                        shape=shape + (len(paths),), fortran_order=True)
+    vol = read_pixels(paths, shape, workers=workers, executor=executor, dtype=dtype, out=out)
+    if out is not None:
+        vol.flush()
+    affine = _get_affine(first, last, len(paths))
     return vol, affine
 
 
 def main():
     ap = argparse.ArgumentParser(description='DICOM series → NumPy/NIfTI')
-    ap.add_argument('--dicom_dir', required=True, type=str)
+    ap.add_argument('--dicom_dir', type=str, default=None)
+    ap.add_argument('--index', type=str, default=None, help='SQLite index from dicom_index.py')
+    ap.add_argument('--series_uid', type=str, default=None, help='SeriesInstanceUID to load')
     ap.add_argument('--out_np', type=str, default=None)
     ap.add_argument('--out_nii', type=str, default=None)
+    ap.add_argument('--workers', type=int, default=None, help='Worker count (default: executor default)')
+    ap.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                    help='Pool used for pixel decoding')
+    ap.add_argument('--int16', action='store_true',
+                    help='Keep int16 HU when RescaleSlope/Intercept are integral (half the memory)')
     args = ap.parse_args()
+    if not args.dicom_dir and not args.index:
+        ap.error('one of --dicom_dir or --index is required')
 
-    vol, affine = load_series(Path(args.dicom_dir))
+    vol, affine = load_series(
+        Path(args.dicom_dir) if args.dicom_dir else None,
+        workers=args.workers, executor=args.executor,
+        series_uid=args.series_uid,
+        index=Path(args.index) if args.index else None,
+        out_np=Path(args.out_np) if args.out_np else None,
+        int16=args.int16,
+    )
     print('Volume shape (HxWxZ):', vol.shape, 'dtype:', vol.dtype)
 
     if args.out_np:
-        np.save(args.out_np, vol)
+        # Slices were written directly into the memory-mapped file by load_series
         print('Saved NumPy volume to', args.out_np)
 
     if args.out_nii:
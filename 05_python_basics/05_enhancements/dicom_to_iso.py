@@ -0,0 +1,88 @@
+"""
+DICOM series → isotropic volume in one step, without an intermediate NIfTI round-trip.
+
+Usage (from repo root):
+  python 05_python_basics/05_enhancements/dicom_to_iso.py \
+      --dicom_dir path/to/series_folder --out 05_python_basics/figures/ct_iso1mm.nii \
+      --spacing 1.0 --workers 8
+
+Notes:
+- The volume and affine come from dicom_series_loader.load_series (same --index/--series_uid
+  and --int16 options) and are handed to SimpleITK in memory; only the final result is written.
+- The loader's Fortran-ordered HxWxZ array is passed as its C-ordered ZxWxH transpose, so
+  building the SimpleITK image is a single memcpy (SimpleITK has no zero-copy import).
+- Geometry matches the old two-step flow (loader → .nii.gz → resample_isotropic_sitk.py),
+  including the RAS→LPS flip SimpleITK applies when it reads a NIfTI file.
+- --out may be .nii (fast, uncompressed), .nii.gz or .npy (HxWxZ array only).
+"""
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    import SimpleITK as sitk
+except Exception:
+    raise SystemExit("SimpleITK is required. Install with: pip install SimpleITK")
+
+from dicom_series_loader import load_series
+from resample_isotropic_sitk import resample_image
+
+# NIfTI (RAS) → ITK (LPS)
+_RAS_TO_LPS = np.diag([-1.0, -1.0, 1.0])
+
+
+def image_from_volume(vol: np.ndarray, affine: Optional[np.ndarray]):
+    """Build a SimpleITK image from an HxWxZ volume and its NIfTI-convention affine."""
+    # vol.T is C-contiguous when vol is Fortran-ordered, so this is one copy with no transpose
+    img = sitk.GetImageFromArray(np.ascontiguousarray(vol.T))
+    if affine is not None:
+        rot = affine[:3, :3]
+        spacing = np.linalg.norm(rot, axis=0)
+        direction = _RAS_TO_LPS @ (rot / spacing)
+        img.SetSpacing([float(s) for s in spacing])
+        img.SetDirection([float(d) for d in direction.ravel()])
+        img.SetOrigin([float(o) for o in _RAS_TO_LPS @ affine[:3, 3]])
+    return img
+
+
+def write_output(img, out: str):
+    """Write .nii/.nii.gz with SimpleITK or .npy (HxWxZ) from a zero-copy array view."""
+    if out.lower().endswith('.npy'):
+        np.save(out, sitk.GetArrayViewFromImage(img).T)
+    else:
+        sitk.WriteImage(img, out)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='DICOM series → isotropic NIfTI/NumPy')
+    ap.add_argument('--dicom_dir', type=str, default=None)
+    ap.add_argument('--index', type=str, default=None, help='SQLite index from dicom_index.py')
+    ap.add_argument('--series_uid', type=str, default=None)
+    ap.add_argument('--out', required=True, help='.nii, .nii.gz or .npy')
+    ap.add_argument('--spacing', type=float, default=1.0)
+    ap.add_argument('--interp', choices=['nearest', 'linear', 'bspline'], default='linear')
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--executor', choices=['thread', 'process'], default='thread')
+    ap.add_argument('--int16', action='store_true', help='Keep int16 HU when slope/intercept are integral')
+    args = ap.parse_args()
+    if not args.dicom_dir and not args.index:
+        ap.error('one of --dicom_dir or --index is required')
+
+    vol, affine = load_series(
+        Path(args.dicom_dir) if args.dicom_dir else None,
+        workers=args.workers, executor=args.executor, series_uid=args.series_uid,
+        index=Path(args.index) if args.index else None, int16=args.int16,
+    )
+    if affine is None:
+        print('[Warning] DICOM geometry tags missing; assuming 1 mm spacing and identity direction.')
+    img = image_from_volume(vol, affine)
+    del vol
+    out = resample_image(img, args.spacing, args.interp)
+    write_output(out, args.out)
+    print('Isotropic volume size:', out.GetSize(), 'spacing:', out.GetSpacing())
+    print('Saved isotropic volume to', args.out)
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,51 @@
 """
 Preprocessing with scikit-image: denoise, edges, morphology; save quick panels.
+Only the displayed slice is read from disk (see volume_io.py).
 
 Usage:
   python 05_python_basics/05_enhancements/preprocessing_skimage.py \
       --in_vol 05_python_basics/figures/ct_volume.nii.gz \
       --out_png 05_python_basics/figures/preproc_panel.png
+
+Pipeline mode (filter chain over the whole volume, streamed to .npy/.nii/.nii.gz):
+  python 05_python_basics/05_enhancements/preprocessing_skimage.py \
+      --in_vol 05_python_basics/figures/ct_volume.nii.gz \
+      --out_vol 05_python_basics/figures/ct_smooth.nii.gz \
+      --chain gaussian:sigma=1.5 opening:radius=1 --mode 3d --chunk 32 --workers 4
+
+Notes:
+- Filters: gaussian:sigma=S, sobel, opening:radius=R (grayscale; disk in 2D, ball in 3D).
+- --mode 3d filters in true 3D; --mode slice filters each z-slice in 2D.
+- The volume is split into z-chunks; in 3D each chunk is padded with a halo deep enough for
+  the whole chain, so results match filtering the full volume at once.
+- Chunks run in a process pool and are written in order as they finish; peak memory is
+  bounded by chunk size x in-flight chunks, not the volume size.
+- Prefer .npy or uncompressed .nii inputs: each chunk read from .nii.gz decompresses up to it.
 """
 import argparse
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
 import numpy as np
 import matplotlib.pyplot as plt
 
-try:
-    import nibabel as nib
-except Exception:
-    nib = None  # type: ignore
-
 from skimage.filters import gaussian, sobel
-from skimage.morphology import opening, disk
+from skimage.morphology import opening, disk, ball
 
+from volume_io import (
+    open_volume, read_slice, read_slices, depth as _depth, volume_affine, VolumeWriter,
+)
 
-def _load(path: str) -> np.ndarray:
-    if path.lower().endswith('.npy'):
-        return np.load(path)
-    if nib is None:
-        raise SystemExit('nibabel required for NIfTI files. Install with: pip install nibabel')
-    img = nib.load(path)
-    return img.get_fdata().astype(np.float32)
+# Volumes opened once per worker process
+_VOLUMES: Dict[str, object] = {}
 
 
 def _panel(img2d: np.ndarray, out_png: str):
     g = gaussian(img2d, sigma=1.0, preserve_range=True)
     e = sobel(img2d)
-    m = opening(img2d > np.percentile(img2d, 75), selem=disk(2))
+    m = opening(img2d > np.percentile(img2d, 75), disk(2))
 
     fig, axes = plt.subplots(1,4, figsize=(12,3))
     titles = ['Original', 'Gaussian σ=1', 'Sobel edges', 'Morph opening']
@@ -44,19 +57,120 @@ def _panel(img2d: np.ndarray, out_png: str):
     print('Saved preprocessing panel to', out_png)
 
 
+def parse_chain(specs: List[str]) -> List[Tuple[str, dict]]:
+    """Parse ['gaussian:sigma=1', 'sobel', 'opening:radius=2'] into (name, params) steps."""
+    chain = []
+    for spec in specs:
+        name, _, rest = spec.partition(':')
+        params = {}
+        for kv in filter(None, rest.split(',')):
+            k, _, v = kv.partition('=')
+            params[k.strip()] = float(v)
+        if name == 'gaussian':
+            params.setdefault('sigma', 1.0)
+        elif name == 'opening':
+            params['radius'] = int(params.get('radius', 2))
+        elif name != 'sobel':
+            raise ValueError(f'Unknown filter {name!r}; choose gaussian, sobel or opening')
+        chain.append((name, params))
+    return chain
+
+
+def chain_halo(chain: List[Tuple[str, dict]]) -> int:
+    """Slices of context each side of a chunk needed for an exact 3D result."""
+    halo = 0
+    for name, p in chain:
+        if name == 'gaussian':
+            halo += int(4.0 * p['sigma'] + 0.5)  # skimage/scipy default truncate=4
+        elif name == 'sobel':
+            halo += 1
+        elif name == 'opening':
+            halo += 2 * p['radius']  # erosion then dilation
+    return halo
+
+
+def apply_chain(arr: np.ndarray, chain: List[Tuple[str, dict]]) -> np.ndarray:
+    """Apply the filter chain to a 2D slice or 3D block."""
+    for name, p in chain:
+        if name == 'gaussian':
+            arr = gaussian(arr, sigma=p['sigma'], preserve_range=True)
+        elif name == 'sobel':
+            arr = sobel(arr)
+        elif name == 'opening':
+            fp = disk(p['radius']) if arr.ndim == 2 else ball(p['radius'])
+            arr = opening(arr, fp)
+    return arr.astype(np.float32, copy=False)
+
+
+def _process_chunk(job: Tuple[str, int, int, int, list, str]) -> np.ndarray:
+    """Worker: read chunk [z0, z1) plus halo, filter it, return the core slices."""
+    in_vol, z0, z1, halo, chain, mode = job
+    vol = _VOLUMES.get(in_vol)
+    if vol is None:
+        vol = _VOLUMES[in_vol] = open_volume(in_vol)
+    if mode == 'slice':
+        block = read_slices(vol, range(z0, z1))
+        return np.stack([apply_chain(block[..., k], chain) for k in range(block.shape[-1])], axis=-1)
+    lo, hi = max(0, z0 - halo), min(_depth(vol), z1 + halo)
+    block = apply_chain(read_slices(vol, range(lo, hi)), chain)
+    return block[..., z0 - lo:z0 - lo + (z1 - z0)]
+
+
+def run_pipeline(in_vol: str, out_vol: str, chain: List[Tuple[str, dict]], mode: str = '3d',
+                 chunk: int = 32, workers: Optional[int] = None):
+    """Filter the whole volume chunk by chunk in a process pool and stream it to out_vol."""
+    if mode not in ('3d', 'slice'):
+        raise ValueError("mode must be '3d' or 'slice'")
+    vol = open_volume(in_vol)
+    if len(vol.shape) != 3:
+        raise SystemExit('Pipeline mode expects a 3D HxWxZ volume')
+    depth = _depth(vol)
+    halo = chain_halo(chain) if mode == '3d' else 0
+    jobs = [(in_vol, z0, min(z0 + chunk, depth), halo, chain, mode) for z0 in range(0, depth, chunk)]
+    n_workers = workers or os.cpu_count() or 1
+
+    os.makedirs(os.path.dirname(out_vol) or '.', exist_ok=True)
+    with VolumeWriter(out_vol, tuple(vol.shape), volume_affine(in_vol)) as writer, \
+            ProcessPoolExecutor(max_workers=n_workers) as pool:
+        # Keep at most 2 chunks per worker in flight so memory stays bounded
+        pending, it = deque(), iter(jobs)
+        for job in it:
+            pending.append(pool.submit(_process_chunk, job))
+            if len(pending) >= 2 * n_workers:
+                break
+        while pending:
+            writer.write(pending.popleft().result())
+            job = next(it, None)
+            if job is not None:
+                pending.append(pool.submit(_process_chunk, job))
+    print(f'Saved filtered volume ({mode}, {len(jobs)} chunks, halo={halo}) to', out_vol)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--in_vol', required=True)
-    ap.add_argument('--out_png', required=True)
+    ap.add_argument('--out_png', default=None, help='Preview panel of one slice')
     ap.add_argument('--z', type=int, default=None, help='Slice index; default uses mid-slice')
+    ap.add_argument('--out_vol', default=None, help='Pipeline mode: filtered volume (.npy/.nii/.nii.gz)')
+    ap.add_argument('--chain', nargs='+', default=['gaussian:sigma=1.0'],
+                    help='Pipeline filters, e.g. gaussian:sigma=1 sobel opening:radius=2')
+    ap.add_argument('--mode', choices=['3d', 'slice'], default='3d')
+    ap.add_argument('--chunk', type=int, default=32, help='Slices per z-chunk')
+    ap.add_argument('--workers', type=int, default=None)
     args = ap.parse_args()
+    if not args.out_png and not args.out_vol:
+        ap.error('one of --out_png or --out_vol is required')
+
+    if args.out_vol:
+        run_pipeline(args.in_vol, args.out_vol, parse_chain(args.chain), mode=args.mode,
+                     chunk=args.chunk, workers=args.workers)
+    if not args.out_png:
+        return
 
-    vol = _load(args.in_vol)
-    if vol.ndim == 2:
-        img = vol
-    else:
-        z = args.z if args.z is not None else vol.shape[-1]//2
-        img = vol[..., z]
+    # Only the requested slice is read from disk
+    vol = open_volume(args.in_vol)
+    z = args.z if args.z is not None else _depth(vol)//2
+    img = read_slice(vol, z)
     # Normalize to 0..1 for visualization
     vmin, vmax = np.percentile(img, (1, 99))
     img = np.clip((img - vmin) / max(vmax - vmin, 1e-6), 0, 1)
@@ -0,0 +1,87 @@
+"""
+Fast QC grid compositor: tile windowed uint8 slices into one mosaic with NumPy, stamp z-labels
+with a tiny bitmap font and write a grayscale PNG directly with zlib (no matplotlib).
+
+Used by window_level_qc.py --engine mosaic; matplotlib remains the default "pretty" engine.
+Compare both with bench_qc_engines.py.
+"""
+import struct
+import zlib
+from typing import Optional, Sequence
+
+import numpy as np
+
+# 3x5 bitmap glyphs for z-labels such as "z=42"
+_GLYPHS = {
+    '0': ('111', '101', '101', '101', '111'),
+    '1': ('010', '110', '010', '010', '111'),
+    '2': ('111', '001', '111', '100', '111'),
+    '3': ('111', '001', '111', '001', '111'),
+    '4': ('101', '101', '111', '001', '001'),
+    '5': ('111', '100', '111', '001', '111'),
+    '6': ('111', '100', '111', '101', '111'),
+    '7': ('111', '001', '001', '001', '001'),
+    '8': ('111', '101', '111', '101', '111'),
+    '9': ('111', '101', '111', '001', '111'),
+    'z': ('111', '001', '010', '100', '111'),
+    '=': ('000', '111', '000', '111', '000'),
+}
+_GLYPH_ARRAYS = {k: np.array([[c == '1' for c in row] for row in v], dtype=bool)
+                 for k, v in _GLYPHS.items()}
+
+
+def _text_mask(text: str, scale: int = 1) -> np.ndarray:
+    """Boolean mask of text rendered with the 3x5 font (1 px spacing), upscaled by scale."""
+    glyphs = [_GLYPH_ARRAYS[c] for c in text if c in _GLYPH_ARRAYS]
+    if not glyphs:
+        return np.zeros((5 * scale, 0), dtype=bool)
+    spacer = np.zeros((5, 1), dtype=bool)
+    parts = []
+    for g in glyphs:
+        parts += [g, spacer]
+    mask = np.hstack(parts[:-1])
+    return np.kron(mask, np.ones((scale, scale), dtype=bool)).astype(bool)
+
+
+def _stamp(tile: np.ndarray, text: str, scale: int):
+    """Draw white text on a black box in the top-left corner of tile (in place)."""
+    mask = _text_mask(text, scale)
+    h, w = mask.shape
+    h, w = min(h, tile.shape[0] - 2 * scale), min(w, tile.shape[1] - 2 * scale)
+    if h <= 0 or w <= 0:
+        return
+    box = tile[:h + 2 * scale, :w + 2 * scale]
+    box[...] = 0
+    box[scale:scale + h, scale:scale + w][mask[:h, :w]] = 255
+
+
+def mosaic(slices: np.ndarray, rows: int, cols: int, labels: Optional[Sequence[str]] = None,
+           gap: int = 2) -> np.ndarray:
+    """Tile an HxWxN uint8 stack into a (rows*H)x(cols*W) image (row-major; empty tiles black)."""
+    h, w, n = slices.shape
+    out = np.zeros((rows * (h + gap) - gap, cols * (w + gap) - gap), dtype=np.uint8)
+    scale = max(1, h // 128)
+    for i in range(min(n, rows * cols)):
+        r, c = divmod(i, cols)
+        tile = out[r * (h + gap):r * (h + gap) + h, c * (w + gap):c * (w + gap) + w]
+        tile[...] = slices[..., i]
+        if labels is not None:
+            _stamp(tile, labels[i], scale)
+    return out
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def write_png(path: str, img: np.ndarray, compress_level: int = 6):
+    """Write a 2D uint8 array as an 8-bit grayscale PNG."""
+    img = np.ascontiguousarray(img, dtype=np.uint8)
+    h, w = img.shape
+    raw = np.zeros((h, w + 1), dtype=np.uint8)  # leading 0 = filter type "None" per scanline
+    raw[:, 1:] = img
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 0, 0, 0, 0)))
+        f.write(_chunk(b'IDAT', zlib.compress(raw.tobytes(), compress_level)))
+        f.write(_chunk(b'IEND', b''))
@@ -4,43 +4,192 @@ Resample a NIfTI volume to isotropic spacing with SimpleITK.
 Usage:
   python 05_python_basics/05_enhancements/resample_isotropic_sitk.py \
       --in_nii path/in.nii.gz --out_nii path/out_iso1mm.nii.gz --spacing 1.0
+
+Batch mode (list or folder of NIfTI files, process pool + content-hash cache):
+  python 05_python_basics/05_enhancements/resample_isotropic_sitk.py \
+      --in_dir data/nifti --out_dir data/iso1mm --spacing 1.0 \
+      --workers 4 --threads 2 --cache_dir data/.resample_cache
+
+Notes:
+- Without --interp, files matching --label_patterns (default *seg*, *label*, *mask*) are
+  resampled with nearest neighbour so label values are preserved, and all others linearly.
+  An explicit --interp is used for every file.
+- The cache key is the SHA-256 of the input bytes plus spacing and interpolator, so an
+  unchanged input is never resampled twice, even if it was renamed or moved.
+- Each worker process keeps one ResampleImageFilter and reuses it for every input.
+- Batch outputs are named from the input file name alone, so inputs with the same name in
+  different folders are rejected before any work starts.
 """
 import argparse
+import fnmatch
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
 
 try:
     import SimpleITK as sitk
 except Exception:
     raise SystemExit("SimpleITK is required. Install with: pip install SimpleITK")
 
+_INTERPOLATORS = {
+    'nearest': sitk.sitkNearestNeighbor,
+    'linear': sitk.sitkLinear,
+    'bspline': sitk.sitkBSpline,
+}
+LABEL_PATTERNS = ['*seg*', '*label*', '*mask*']
 
-def resample_iso(in_path: str, out_path: str, iso_spacing: float = 1.0):
-    img = sitk.ReadImage(in_path)
+# One resampler per (worker) process, reconfigured for each image
+_RESAMPLER = None
+
+
+def resample_image(img, iso_spacing: float = 1.0, interpolator: str = 'linear'):
+    """Resample an in-memory SimpleITK image to isotropic spacing."""
+    global _RESAMPLER
     orig_spacing = img.GetSpacing()
     orig_size = img.GetSize()
 
     new_spacing = [iso_spacing, iso_spacing, iso_spacing]
     new_size = [int(round(osz*ospc/nspc)) for osz, ospc, nspc in zip(orig_size, orig_spacing, new_spacing)]
 
-    resampler = sitk.ResampleImageFilter()
+    if _RESAMPLER is None:
+        _RESAMPLER = sitk.ResampleImageFilter()
+    resampler = _RESAMPLER
     resampler.SetOutputSpacing(new_spacing)
     resampler.SetSize(new_size)
     resampler.SetOutputDirection(img.GetDirection())
     resampler.SetOutputOrigin(img.GetOrigin())
-    resampler.SetInterpolator(sitk.sitkLinear)
+    resampler.SetInterpolator(_INTERPOLATORS[interpolator])
+    return resampler.Execute(img)
 
-    out = resampler.Execute(img)
+
+def resample_iso(in_path: str, out_path: str, iso_spacing: float = 1.0, interpolator: str = 'linear'):
+    img = sitk.ReadImage(in_path)
+    out = resample_image(img, iso_spacing, interpolator)
     sitk.WriteImage(out, out_path)
 
 
+def _file_hash(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(block), b''):
+            h.update(buf)
+    return h.hexdigest()
+
+
+def _pick_interpolator(path: str, interp: Optional[str], label_patterns: Sequence[str]) -> str:
+    """interp if given, else nearest for label-like file names and linear otherwise."""
+    if interp is not None:
+        return interp
+    name = os.path.basename(path).lower()
+    return 'nearest' if any(fnmatch.fnmatch(name, p.lower()) for p in label_patterns) else 'linear'
+
+
+def _out_name(in_path: str, spacing: float) -> str:
+    name = os.path.basename(in_path)
+    for ext in ('.nii.gz', '.nii'):
+        if name.lower().endswith(ext):
+            return f'{name[:-len(ext)]}_iso{spacing:g}mm{ext}'
+    return f'{name}_iso{spacing:g}mm.nii.gz'
+
+
+def _init_worker(threads: Optional[int]):
+    if threads:
+        sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(int(threads))
+
+
+def _run_job(job) -> dict:
+    """Worker: resample one input unless its cache entry exists; copy result to out_path."""
+    in_path, out_path, spacing, interp, cache_dir = job
+    record = {'in_nii': in_path, 'out_nii': out_path, 'interpolator': interp, 'status': 'ok', 'error': ''}
+    try:
+        cached = None
+        if cache_dir:
+            key = hashlib.sha256(f'{_file_hash(in_path)}|{spacing!r}|{interp}'.encode()).hexdigest()
+            cached = os.path.join(cache_dir, key + ('.nii.gz' if out_path.endswith('.gz') else '.nii'))
+            if os.path.exists(cached):
+                shutil.copyfile(cached, out_path)
+                record['status'] = 'cached'
+                return record
+        resample_iso(in_path, out_path, spacing, interp)
+        if cached:
+            tmp = f'{cached}.{os.getpid()}.tmp'
+            shutil.copyfile(out_path, tmp)
+            os.replace(tmp, cached)  # atomic, safe with concurrent workers
+    except Exception as e:
+        record['status'], record['error'] = 'failed', f'{type(e).__name__}: {e}'
+    return record
+
+
+def resample_batch(inputs: List[str], out_dir: str, spacing: float = 1.0, interp: Optional[str] = None,
+                   label_patterns: Sequence[str] = LABEL_PATTERNS, cache_dir: Optional[str] = None,
+                   workers: Optional[int] = None, threads: Optional[int] = None) -> List[dict]:
+    """Resample many NIfTI files in a process pool; returns one record per input.
+
+    interp=None picks nearest for files matching label_patterns and linear for the rest.
+
+    Raises ValueError, before any work starts, if two inputs map to the same output name
+    (e.g. a/ct.nii.gz and b/ct.nii.gz): their workers would overwrite each other's file.
+    """
+    jobs = [(p, os.path.join(out_dir, _out_name(p, spacing)), spacing,
+             _pick_interpolator(p, interp, label_patterns), cache_dir) for p in inputs]
+    by_out: Dict[str, List[str]] = {}
+    for p, out_path, *_ in jobs:
+        by_out.setdefault(out_path, []).append(p)
+    clashes = {o: ps for o, ps in by_out.items() if len(ps) > 1}
+    if clashes:
+        raise ValueError('Several inputs map to the same output:\n' + '\n'.join(
+            f'  {o} <- {", ".join(ps)}' for o, ps in sorted(clashes.items())))
+    os.makedirs(out_dir, exist_ok=True)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        return list(pool.map(_run_job, jobs))
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--in_nii', required=True)
-    ap.add_argument('--out_nii', required=True)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--in_nii')
+    src.add_argument('--inputs', nargs='+', help='Batch: NIfTI files')
+    src.add_argument('--in_dir', help='Batch: folder of .nii/.nii.gz files')
+    ap.add_argument('--out_nii', help='Output path (single-file mode)')
+    ap.add_argument('--out_dir', help='Batch: output folder (<name>_iso<spacing>mm.nii.gz)')
     ap.add_argument('--spacing', type=float, default=1.0)
+    ap.add_argument('--interp', choices=sorted(_INTERPOLATORS), default=None,
+                    help='Interpolator for every file (default: nearest for --label_patterns '
+                         'matches, linear otherwise)')
+    ap.add_argument('--label_patterns', nargs='*', default=LABEL_PATTERNS,
+                    help='Filename patterns resampled with nearest neighbour when --interp is not given')
+    ap.add_argument('--cache_dir', default=None, help='Batch: content-hash cache of outputs')
+    ap.add_argument('--workers', type=int, default=None, help='Batch: processes')
+    ap.add_argument('--threads', type=int, default=None, help='SimpleITK threads per process')
     args = ap.parse_args()
 
-    resample_iso(args.in_nii, args.out_nii, args.spacing)
-    print('Saved isotropic NIfTI to', args.out_nii)
+    if args.in_nii:
+        if not args.out_nii:
+            ap.error('--out_nii is required with --in_nii')
+        _init_worker(args.threads)
+        interp = _pick_interpolator(args.in_nii, args.interp, args.label_patterns)
+        resample_iso(args.in_nii, args.out_nii, args.spacing, interp)
+        print(f'Saved isotropic NIfTI to {args.out_nii} ({interp})')
+        return
+
+    if not args.out_dir:
+        ap.error('--out_dir is required in batch mode')
+    inputs = args.inputs or sorted(str(p) for p in Path(args.in_dir).iterdir()
+                                   if p.name.lower().endswith(('.nii', '.nii.gz')))
+    try:
+        results = resample_batch(inputs, args.out_dir, args.spacing, args.interp, args.label_patterns,
+                                 args.cache_dir, args.workers, args.threads)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    for r in results:
+        print(f"[{r['status']}] {r['in_nii']} -> {r['out_nii']} ({r['interpolator']}) {r['error']}")
+    n_ok = sum(r['status'] != 'failed' for r in results)
+    print(f'Resampled {n_ok}/{len(results)} volumes to', args.out_dir)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,75 @@
+"""dicom_index rescans and index-backed loads: run with `python -m pytest 05_python_basics/05_enhancements/tests`."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from dicom_index import build_index, list_series  # noqa: E402
+from dicom_series_loader import load_series  # noqa: E402
+
+
+def _write_series(folder: Path, n: int, intercepts=None) -> str:
+    """n synthetic CT slices of one new series in folder; returns its SeriesInstanceUID.
+
+    intercepts: optional RescaleIntercept per slice (slope is always 1).
+    """
+    folder.mkdir(parents=True)
+    study, series = generate_uid(), generate_uid()
+    for i in range(n):
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = pydicom.uid.CTImageStorage
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds = FileDataset(str(folder / f'{i}.dcm'), {}, file_meta=meta, preamble=b'\0' * 128)
+        ds.SOPClassUID, ds.SOPInstanceUID = meta.MediaStorageSOPClassUID, meta.MediaStorageSOPInstanceUID
+        ds.StudyInstanceUID, ds.SeriesInstanceUID, ds.Modality = study, series, 'CT'
+        ds.SeriesNumber, ds.InstanceNumber = 1, i + 1
+        ds.ImagePositionPatient = [0, 0, float(i)]
+        ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        ds.Rows = ds.Columns = 4
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 16, 15, 1
+        ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, 'MONOCHROME2'
+        ds.PixelData = np.zeros((4, 4), dtype=np.int16).tobytes()
+        if intercepts is not None:
+            ds.RescaleSlope, ds.RescaleIntercept = 1, intercepts[i]
+        ds.save_as(folder / f'{i}.dcm', enforce_file_format=True)
+    return series
+
+
+def test_subtree_rescan_keeps_sibling_series(tmp_path):
+    root, db = tmp_path / 'export', tmp_path / 'index.sqlite'
+    a = _write_series(root / 'series_a', 3)
+    b = _write_series(root / 'series_b', 2)
+    assert build_index(root, db)['added'] == 5
+
+    counts = build_index(root / 'series_a', db)
+    assert counts['removed'] == 0 and counts['unchanged'] == 3
+    assert {s['series_uid']: s['n_files'] for s in list_series(db)} == {a: 3, b: 2}
+
+
+def test_rescan_drops_files_deleted_under_root(tmp_path):
+    root, db = tmp_path / 'export', tmp_path / 'index.sqlite'
+    a = _write_series(root / 'series_a', 3)
+    b = _write_series(root / 'series_b', 2)
+    build_index(root, db)
+    (root / 'series_a' / '0.dcm').unlink()
+
+    assert build_index(root / 'series_a', db)['removed'] == 1
+    assert {s['series_uid']: s['n_files'] for s in list_series(db)} == {a: 2, b: 2}
+
+
+def test_int16_load_checks_every_indexed_slice(tmp_path):
+    root, db = tmp_path / 'export', tmp_path / 'index.sqlite'
+    whole = _write_series(root / 'whole', 3, intercepts=[-1024, -1024, -1024])
+    # only the middle slice has a fractional intercept: first/last alone would pass
+    mixed = _write_series(root / 'mixed', 3, intercepts=[-1024, -1024.5, -1024])
+    build_index(root, db)
+
+    vol, _ = load_series(series_uid=whole, index=db, int16=True)
+    assert vol.dtype == np.int16 and (vol == -1024).all()
+    vol, _ = load_series(series_uid=mixed, index=db, int16=True)
+    assert vol.dtype == np.float32 and vol[..., 1].max() == -1024.5
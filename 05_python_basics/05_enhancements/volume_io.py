@@ -0,0 +1,124 @@
+"""
+Lazy volume access shared by the QC and preprocessing scripts.
+
+.npy files are opened with np.load(mmap_mode='r') and NIfTI files through nibabel's
+dataobj proxy, so only the slices that are actually read are loaded and converted to
+float32. Startup time and memory scale with the number of slices used, not the volume size.
+VolumeWriter is the output counterpart: it streams z-chunks to .npy or NIfTI in order.
+
+Usage (from another script in this folder):
+  from volume_io import open_volume, read_slices
+  vol = open_volume('ct_volume.nii.gz')
+  stack = read_slices(vol, [10, 20, 30])   # HxWx3 float32
+"""
+import gzip
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import nibabel as nib
+except Exception:
+    nib = None  # type: ignore
+
+
+def open_volume(path: str):
+    """Open a .npy or NIfTI volume without reading its voxels.
+
+    Returns an array-like with .shape/.ndim that supports vol[..., z] slicing.
+    """
+    if path.lower().endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if nib is None:
+        raise SystemExit('nibabel required for NIfTI files. Install with: pip install nibabel')
+    # keep_file_open avoids re-decompressing .nii.gz from the start for every slice
+    return nib.load(path, keep_file_open=True).dataobj
+
+
+def read_slice(vol, z: int) -> np.ndarray:
+    """Read one axial slice as float32 (2D volumes are returned as-is)."""
+    if len(vol.shape) == 2:
+        return np.asarray(vol[...], dtype=np.float32)
+    return np.asarray(vol[..., int(z)], dtype=np.float32)
+
+
+def read_slices(vol, zs: Sequence[int], dtype=np.float32) -> np.ndarray:
+    """Read the given slices (ascending order is fastest for .nii.gz) into an HxWxN array.
+
+    dtype=None keeps the stored dtype (after any NIfTI scl_slope/inter scaling), e.g. int16 HU.
+    """
+    zs = list(zs)
+    if len(vol.shape) == 2:
+        arr = np.asarray(vol[...])
+        return (arr if dtype is None else arr.astype(dtype, copy=False))[..., None]
+    first = np.asarray(vol[..., int(zs[0])])
+    out = np.empty(tuple(vol.shape[:2]) + (len(zs),), dtype=first.dtype if dtype is None else dtype)
+    out[..., 0] = first
+    for i, z in enumerate(zs[1:], start=1):
+        out[..., i] = vol[..., int(z)]
+    return out
+
+
+def depth(vol) -> int:
+    """Number of slices along the last axis (1 for 2D images)."""
+    return 1 if len(vol.shape) == 2 else int(vol.shape[-1])
+
+
+def volume_affine(path: str) -> np.ndarray:
+    """NIfTI affine of path, identity for .npy and other formats."""
+    if nib is not None and not path.lower().endswith('.npy'):
+        return nib.load(path).affine
+    return np.eye(4)
+
+
+class VolumeWriter:
+    """Write an HxWxZ float32 volume z-chunk by z-chunk, in order, without holding it in memory.
+
+    .npy targets are a Fortran-ordered memory map; .nii/.nii.gz targets get a NIfTI-1 header
+    followed by the voxel data appended chunk by chunk (NIfTI stores z as the slowest axis).
+    """
+
+    def __init__(self, path: str, shape: Tuple[int, int, int], affine: Optional[np.ndarray] = None):
+        self.path, self.shape, self.z = path, tuple(shape), 0
+        self._mm, self._f = None, None
+        if path.lower().endswith('.npy'):
+            self._mm = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                                 shape=self.shape, fortran_order=True)
+            return
+        if nib is None:
+            raise SystemExit('nibabel required for NIfTI files. Install with: pip install nibabel')
+        hdr = nib.Nifti1Header()
+        hdr.set_data_shape(self.shape)
+        hdr.set_data_dtype(np.float32)
+        affine = np.eye(4) if affine is None else affine
+        hdr.set_qform(affine, code=1)
+        hdr.set_sform(affine, code=1)
+        hdr['vox_offset'] = 352
+        self._f = gzip.open(path, 'wb', compresslevel=1) if path.lower().endswith('.gz') else open(path, 'wb')
+        self._f.write(hdr.binaryblock + b'\x00' * 4)  # 348-byte header + empty extension flag
+
+    def write(self, chunk: np.ndarray):
+        """Append the next HxWxk block of slices."""
+        k = chunk.shape[-1]
+        if self._mm is not None:
+            self._mm[..., self.z:self.z + k] = chunk
+        else:
+            self._f.write(np.asarray(chunk, dtype=np.float32).tobytes(order='F'))
+        self.z += k
+
+    def close(self):
+        if self.z != self.shape[-1]:
+            raise RuntimeError(f'{self.path}: wrote {self.z} of {self.shape[-1]} slices')
+        if self._mm is not None:
+            self._mm.flush()
+        else:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._f is not None:
+            self._f.close()
@@ -1,31 +1,66 @@
 """
 Window/Level QC panel: load a NIfTI (.nii/.nii.gz) or NumPy (.npy) volume and save a grid PNG.
+Only the rows*cols displayed slices are read from disk (see volume_io.py).
 
 Usage:
   python 05_python_basics/05_enhancements/window_level_qc.py \
       --in_vol 05_python_basics/figures/ct_volume.nii.gz \
       --out_png 05_python_basics/figures/qc_panel.png \
       --center 50 --width 350 --rows 4 --cols 4
+
+Several windows from one read (one PNG per window, e.g. qc_panel_lung.png):
+  python 05_python_basics/05_enhancements/window_level_qc.py \
+      --in_vol 05_python_basics/figures/ct_volume.nii.gz \
+      --out_png 05_python_basics/figures/qc_panel.png \
+      --preset lung mediastinum bone --window 40,80 --window=-600,1500
+
+Batch mode (a cohort in one launch, rendered in a process pool):
+  python 05_python_basics/05_enhancements/window_level_qc.py \
+      --glob "data/cohort/*.nii.gz" --out_dir qc_panels --workers 8 \
+      --summary_csv qc_panels/qc_summary.csv
+
+Notes:
+- --manifest takes a CSV with an in_vol column and an optional out_png column;
+  otherwise panels are written to --out_dir as <name>_qc.png. Volumes that would share a
+  panel name (same file name in different folders) stop the batch before anything is
+  rendered; list them in a manifest with their own out_png.
+- Panels newer than their input volume are skipped unless --force is given.
+- --window is repeatable, one C,W per flag; write a negative center as --window=-600,1500
+  (with a space, argparse takes -600,1500 for an option).
+- --preset/--window may be combined; the displayed slices are read once and every window is
+  rendered from that read. Integer inputs (e.g. int16 HU) go through a lookup table instead
+  of a float clip/scale per window.
+- --engine mosaic skips matplotlib layout/rasterisation: slices are tiled with NumPy, z-labels
+  are stamped with a bitmap font and the PNG is written directly (see qc_mosaic.py).
+- Each worker imports matplotlib once (Agg backend) and reuses one figure across volumes.
 """
 import argparse
+import csv
+import glob
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
-try:
-    import nibabel as nib
-except Exception:
-    nib = None  # type: ignore
+from qc_mosaic import mosaic, write_png
+from volume_io import open_volume, read_slices, depth as _depth
 
+# One figure per (worker) process, reused across volumes in batch mode
+_FIG = None
 
-def _load(path: str) -> np.ndarray:
-    if path.lower().endswith('.npy'):
-        return np.load(path)
-    if nib is None:
-        raise SystemExit('nibabel required for NIfTI files. Install with: pip install nibabel')
-    img = nib.load(path)
-    data = img.get_fdata().astype(np.float32)
-    return data
+# Named (center, width) presets in HU
+WINDOW_PRESETS = {
+    'lung': (-600, 1500),
+    'mediastinum': (50, 350),
+    'soft_tissue': (50, 400),
+    'bone': (400, 1800),
+    'brain': (40, 80),
+}
 
 
 def _window(data: np.ndarray, center: float, width: float) -> np.ndarray:
@@ -35,39 +70,236 @@ def _window(data: np.ndarray, center: float, width: float) -> np.ndarray:
     return (data * 255).astype(np.uint8)
 
 
+def _window_lut(data: np.ndarray, windows: Sequence[Tuple[str, float, float]]) -> List[np.ndarray]:
+    """Window integer data for several (name, center, width) settings via lookup tables.
+
+    The data are offset to LUT indices once; each window is then a single gather.
+    """
+    lo, hi = int(data.min()), int(data.max())
+    idx = data.astype(np.intp) - lo
+    levels = np.arange(lo, hi + 1, dtype=np.float32)
+    return [_window(levels, c, w)[idx] for _, c, w in windows]
+
+
+def _window_all(data: np.ndarray, windows: Sequence[Tuple[str, float, float]]) -> List[np.ndarray]:
+    if np.issubdtype(data.dtype, np.integer):
+        return _window_lut(data, windows)
+    data = data.astype(np.float32, copy=False)
+    return [_window(data, c, w) for _, c, w in windows]
+
+
+def parse_windows(presets: Optional[Sequence[str]] = None, windows: Optional[Sequence[str]] = None,
+                  center: float = 50, width: float = 350) -> List[Tuple[str, float, float]]:
+    """(name, center, width) list from preset names and 'C,W' strings; defaults to center/width."""
+    out = []
+    for name in presets or []:
+        if name not in WINDOW_PRESETS:
+            raise ValueError(f"Unknown preset {name!r}; choose from {', '.join(WINDOW_PRESETS)}")
+        out.append((name,) + WINDOW_PRESETS[name])
+    for spec in windows or []:
+        c, w = (float(v) for v in spec.split(','))
+        out.append((f'c{c:g}_w{w:g}', c, w))
+    return out or [('custom', center, width)]
+
+
+def output_paths(out_png: str, windows: Sequence[Tuple[str, float, float]]) -> List[str]:
+    """out_png itself for a single window, else <stem>_<name>.png per window."""
+    if len(windows) == 1:
+        return [out_png]
+    root, ext = os.path.splitext(out_png)
+    return [f'{root}_{name}{ext or ".png"}' for name, _, _ in windows]
+
+
 def _pick_slices(n_slices: int, depth: int) -> np.ndarray:
     idx = np.linspace(0, depth-1, num=n_slices, dtype=int)
     return np.unique(idx)
 
 
+def _figure(figsize: Tuple[float, float]):
+    """Return the process-wide figure, cleared and resized."""
+    global _FIG
+    if _FIG is None:
+        _FIG = plt.figure(figsize=figsize)
+    else:
+        _FIG.clf()
+        _FIG.set_size_inches(*figsize)
+    return _FIG
+
+
+def render_panel(in_vol: str, out_png: str, center: float = 50, width: float = 350,
+                 rows: int = 4, cols: int = 4, engine: str = 'matplotlib',
+                 windows: Optional[Sequence[Tuple[str, float, float]]] = None) -> List[str]:
+    """Render QC grid PNG(s) for one volume; returns the written paths.
+
+    windows is a list of (name, center, width) (see parse_windows); by default the single
+    center/width window is used. engine='matplotlib' draws titled subplots; engine='mosaic'
+    tiles the slices with NumPy and writes the PNG directly (much faster, no axes).
+    """
+    if engine not in ('matplotlib', 'mosaic'):
+        raise ValueError("engine must be 'matplotlib' or 'mosaic'")
+    windows = list(windows) if windows else [('custom', center, width)]
+    vol = open_volume(in_vol)
+    total = rows * cols
+    sel = _pick_slices(total, _depth(vol))[:total]
+
+    # Only the displayed slices are read, once, and every window is rendered from that read
+    stack = read_slices(vol, sel, dtype=None)
+    outs = output_paths(out_png, windows)
+    os.makedirs(os.path.dirname(out_png) or '.', exist_ok=True)
+    for wl, path in zip(_window_all(stack, windows), outs):
+        _render(wl, sel, path, rows, cols, engine)
+    return outs
+
+
+def _render(wl: np.ndarray, sel: np.ndarray, out_png: str, rows: int, cols: int, engine: str):
+    if engine == 'mosaic':
+        write_png(out_png, mosaic(wl, rows, cols, labels=[f'z={z}' for z in sel]))
+        return
+
+    fig = _figure((cols*2.5, rows*2.5))
+    for i, z in enumerate(sel):
+        ax = fig.add_subplot(rows, cols, i+1)
+        ax.imshow(wl[..., i], cmap='gray', vmin=0, vmax=255)
+        ax.axis('off'); ax.set_title(f'z={z}', fontsize=8)
+    fig.tight_layout()
+    fig.savefig(out_png, dpi=200)
+
+
+def _stem(path: str) -> str:
+    name = os.path.basename(path)
+    for ext in ('.nii.gz', '.nii', '.npy'):
+        if name.lower().endswith(ext):
+            return name[:-len(ext)]
+    return os.path.splitext(name)[0]
+
+
+def _batch_jobs(args) -> List[Tuple[str, str]]:
+    """(in_vol, out_png) pairs from --manifest or --glob."""
+    if args.manifest:
+        with open(args.manifest, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        ins = [r['in_vol'] for r in rows]
+        outs = [r.get('out_png') or None for r in rows]
+    else:
+        ins = sorted(glob.glob(args.glob, recursive=True))
+        outs = [None] * len(ins)
+    jobs = []
+    for src, dst in zip(ins, outs):
+        if dst is None:
+            if not args.out_dir:
+                raise SystemExit('--out_dir is required when out_png is not given per volume')
+            dst = os.path.join(args.out_dir, f'{_stem(src)}_qc.png')
+        jobs.append((src, dst))
+    # inputs sharing a stem (cohort/*/ct.nii.gz, x.nii.gz next to x.npy) would overwrite
+    # each other's panel in the pool and all be reported ok
+    by_dst: Dict[str, List[str]] = {}
+    for src, dst in jobs:
+        by_dst.setdefault(os.path.normpath(dst), []).append(src)
+    clashes = {dst: srcs for dst, srcs in by_dst.items() if len(srcs) > 1}
+    if clashes:
+        lines = [f'  {dst} <- {", ".join(srcs)}' for dst, srcs in sorted(clashes.items())]
+        raise SystemExit('Several volumes map to the same panel; give out_png per volume '
+                         'in a --manifest:\n' + '\n'.join(lines))
+    return jobs
+
+
+def _is_fresh(in_vol: str, out_pngs: Sequence[str]) -> bool:
+    # A missing or unreadable input is never fresh: _run_job then records it as failed
+    try:
+        src = os.path.getmtime(in_vol)
+        return all(os.path.exists(p) and os.path.getmtime(p) >= src for p in out_pngs)
+    except OSError:
+        return False
+
+
+def _run_job(job: Tuple[str, str, float, float, int, int, str, list]) -> dict:
+    """Worker entry point: render one panel and report timing or failure."""
+    in_vol, out_png = job[0], job[1]
+    t0 = time.perf_counter()
+    try:
+        render_panel(*job)
+        status, error = 'ok', ''
+    except Exception as e:
+        status, error = 'failed', f'{type(e).__name__}: {e}'
+    return {'in_vol': in_vol, 'out_png': out_png, 'status': status,
+            'seconds': round(time.perf_counter() - t0, 3), 'error': error}
+
+
+def run_batch(jobs: List[Tuple[str, str]], center: float, width: float, rows: int, cols: int,
+              workers: Optional[int] = None, force: bool = False,
+              engine: str = 'matplotlib',
+              windows: Optional[Sequence[Tuple[str, float, float]]] = None) -> List[dict]:
+    """Render many panels in a process pool; returns one summary record per volume."""
+    windows = list(windows) if windows else [('custom', center, width)]
+    results, todo = [], []
+    for in_vol, out_png in jobs:
+        if not force and _is_fresh(in_vol, output_paths(out_png, windows)):
+            results.append({'in_vol': in_vol, 'out_png': out_png, 'status': 'skipped',
+                            'seconds': 0.0, 'error': ''})
+        else:
+            todo.append((in_vol, out_png, center, width, rows, cols, engine, windows))
+    if todo:
+        n_workers = workers or os.cpu_count() or 1
+        chunk = max(1, len(todo) // (n_workers * 4))
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results.extend(pool.map(_run_job, todo, chunksize=chunk))
+    return results
+
+
+def _write_summary(results: List[dict], path: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=['in_vol', 'out_png', 'status', 'seconds', 'error'])
+        w.writeheader()
+        w.writerows(results)
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument('--in_vol', required=True)
-    ap.add_argument('--out_png', required=True)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--in_vol')
+    src.add_argument('--manifest', help='Batch: CSV with in_vol[,out_png] columns')
+    src.add_argument('--glob', help='Batch: glob pattern of volumes (quote it)')
+    ap.add_argument('--out_png', help='Output PNG (single-volume mode)')
+    ap.add_argument('--out_dir', help='Batch: folder for <name>_qc.png outputs')
+    ap.add_argument('--summary_csv', default=None, help='Batch: timings/failures CSV')
+    ap.add_argument('--workers', type=int, default=None, help='Batch: process count (default: all cores)')
+    ap.add_argument('--force', action='store_true', help='Batch: re-render panels newer than inputs')
     ap.add_argument('--center', type=float, default=50)
     ap.add_argument('--width', type=float, default=350)
+    ap.add_argument('--preset', nargs='+', choices=sorted(WINDOW_PRESETS), default=None,
+                    help='Named window(s); overrides --center/--width')
+    ap.add_argument('--window', action='append', default=None, metavar='C,W',
+                    help='Extra center,width window; repeatable, e.g. --window 40,80 '
+                         '--window=-600,1500 (use = when the center is negative)')
     ap.add_argument('--rows', type=int, default=4)
     ap.add_argument('--cols', type=int, default=4)
+    ap.add_argument('--engine', choices=['matplotlib', 'mosaic'], default='matplotlib',
+                    help='mosaic = fast NumPy tiling + direct PNG write')
     args = ap.parse_args()
+    windows = parse_windows(args.preset, args.window, args.center, args.width)
+
+    if args.in_vol:
+        if not args.out_png:
+            ap.error('--out_png is required with --in_vol')
+        for path in render_panel(args.in_vol, args.out_png, rows=args.rows, cols=args.cols,
+                                 engine=args.engine, windows=windows):
+            print('Saved QC panel to', path)
+        return
 
-    vol = _load(args.in_vol)
-    if vol.ndim == 2:
-        vol = vol[..., None]
-    depth = vol.shape[-1]
-    total = args.rows * args.cols
-    sel = _pick_slices(total, depth)
-
-    wl = _window(vol, args.center, args.width)
-
-    plt.figure(figsize=(args.cols*2.5, args.rows*2.5))
-    for i, z in enumerate(sel[:total]):
-        plt.subplot(args.rows, args.cols, i+1)
-        plt.imshow(wl[..., z], cmap='gray', vmin=0, vmax=255)
-        plt.axis('off'); plt.title(f'z={z}', fontsize=8)
-    plt.tight_layout()
-    os.makedirs(os.path.dirname(args.out_png), exist_ok=True)
-    plt.savefig(args.out_png, dpi=200)
-    print('Saved QC panel to', args.out_png)
+    jobs = _batch_jobs(args)
+    t0 = time.perf_counter()
+    results = run_batch(jobs, args.center, args.width, args.rows, args.cols,
+                        workers=args.workers, force=args.force, engine=args.engine,
+                        windows=windows)
+    elapsed = time.perf_counter() - t0
+    counts = {s: sum(r['status'] == s for r in results) for s in ('ok', 'skipped', 'failed')}
+    rate = counts['ok'] / elapsed * 60 if elapsed > 0 else float('nan')
+    print(f"QC batch: {counts['ok']} rendered, {counts['skipped']} skipped, "
+          f"{counts['failed']} failed in {elapsed:.1f}s ({rate:.1f} volumes/min)")
+    if args.summary_csv:
+        _write_summary(results, args.summary_csv)
+        print('Saved QC summary to', args.summary_csv)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,79 @@
+# bench_report.py — bulk DOCX tables and cached templates vs the per-cell / per-render versions
+"""
+Usage (from repo root):
+  python python/bench_report.py --rows 1000 --repeats 5
+
+An OR-table-shaped frame (term, OR, CI_lower, CI_upper, p_value) with --rows rows is written
+to a DOCX table cell by cell through python-docx (the loop render_docx_report used) and with
+snippets.report.add_docx_table; the cell texts must be identical. The HTML side renders the
+report template with a fresh Jinja Environment per render against the cached get_template.
+"""
+from __future__ import annotations
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from docx import Document
+from jinja2 import Environment, FileSystemLoader
+
+from snippets.report import TEMPLATE_DIR, add_docx_table, get_template, html_table
+
+def synthetic(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    est = rng.lognormal(0, 0.3, rows)
+    return pd.DataFrame({'term': [f'facility_{i}' for i in range(rows)], 'OR': est,
+                         'CI_lower': est * 0.8, 'CI_upper': est * 1.25, 'p_value': rng.random(rows)})
+
+def per_cell_table(doc, df):
+    t = doc.add_table(rows=1, cols=len(df.columns))
+    t.style = 'Light List'
+    hdr = t.rows[0].cells
+    for i, c in enumerate(df.columns):
+        hdr[i].text = str(c)
+    for _, row in df.iterrows():
+        cells = t.add_row().cells
+        for i, c in enumerate(df.columns):
+            val = row[c]
+            cells[i].text = str(round(val, 3)) if isinstance(val, (int, float)) else str(val)
+    return t
+
+def _timed(fn, *a, **k):
+    t0 = time.perf_counter()
+    out = fn(*a, **k)
+    return out, time.perf_counter() - t0
+
+def _texts(table):
+    return [[c.text for c in r.cells] for r in table.rows]
+
+def _context(df):
+    tbl = html_table(df)
+    return {'title': 'Benchmark', 'author': '', 'institution': '', 'generated': '',
+            'params': {'covars': []}, 'imputation': {'method': 'none', 'm': 1}, 'include_tables': True,
+            'or_table_html': tbl, 'hr_table_html': tbl, 'ph_table_html': tbl}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rows', type=int, nargs='+', default=[100, 1000])
+    ap.add_argument('--repeats', type=int, default=5, help='Template renders per variant')
+    args = ap.parse_args()
+
+    print(f"{'rows':>6} {'per-cell s':>10} {'bulk s':>7} {'speed-up':>8} {'fresh env s':>11} {'cached s':>8}")
+    for rows in args.rows:
+        df = synthetic(rows)
+        ref, s_ref = _timed(per_cell_table, Document(), df)
+        new, s_new = _timed(add_docx_table, Document(), df)
+        assert _texts(ref) == _texts(new)
+        ctx = _context(df)
+        t0 = time.perf_counter()
+        for _ in range(args.repeats):
+            Environment(loader=FileSystemLoader(str(TEMPLATE_DIR))).get_template('report_template.html').render(**ctx)
+        s_fresh = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for _ in range(args.repeats):
+            get_template().render(**ctx)
+        s_cached = time.perf_counter() - t0
+        print(f'{rows:>6} {s_ref:>10.2f} {s_new:>7.3f} {s_ref / s_new:>7.0f}x {s_fresh:>11.3f} {s_cached:>8.3f}')
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,38 @@
 # run_analysis.py — V2: YAML config, diagnostics, imputation, HTML+DOCX report
 from __future__ import annotations
 import argparse
+import os
+from functools import partial
 from pathlib import Path
 import datetime as _dt
 
+import numpy as np
 import pandas as pd
 import yaml
-from jinja2 import Environment, FileSystemLoader
+import matplotlib
+matplotlib.use('Agg')  # figures are rendered in worker processes
+import matplotlib.pyplot as plt
 from docx import Document
 from docx.shared import Inches
 
-from snippets.data_io import read_clean, set_categorical_ref
+from snippets.data_io import read_clean, read_clean_chunked, set_categorical_ref
 from snippets.logistic_regression import fit_logistic, or_table
-from snippets.survival_analysis import km_fit_plot, cox_fit, hr_table
+from snippets.survival_analysis import km_fit_plot, cox_fit, cox_predict, hr_table
+from snippets.kaplan_meier import km_estimate, risk_table, logrank_test
 from snippets.diagnostics import (
-    logistic_diagnostics, save_roc_plot, save_calibration_plot, cox_ph_test_table
+    save_roc_plot, save_calibration_plot, cox_ph_test_table,
+    bootstrap_logistic, bootstrap_concordance, format_ci
 )
-from snippets.imputation import impute_covariates
+from snippets.survival_metrics import uno_c, cumulative_dynamic_auc
+from snippets.imputation import impute_covariates, fit_imputer
+from snippets.multiple_imputation import (
+    multiple_impute, impute_all, save_imputers, load_imputers, pool_logistic, pool_cox
+)
+from snippets.cross_validation import cross_validate, summarize_folds
+from snippets.subgroups import subgroup_analysis
+from snippets.report import add_docx_table, get_template, html_table
+from snippets.stage_cache import StageCache, file_digest, stage_key
+from snippets.scheduler import run_dag, format_timings
 
 def parse_args():
     ap = argparse.ArgumentParser()
@@ -30,10 +46,17 @@ def parse_args():
     ap.add_argument('--group')
     ap.add_argument('--ref_group')
     ap.add_argument('--cluster')
+    # Run options (apply with or without --config)
+    ap.add_argument('--force', nargs='*', default=None, metavar='STAGE',
+                    help='Recompute cached stages (all if no names given): '
+                         'load impute cv logistic logistic_plots cox km_plot subgroups')
+    ap.add_argument('--no_cache', action='store_true', help='Disable the stage cache for this run')
+    ap.add_argument('--workers', type=int, default=None,
+                    help='Processes for independent stages (overrides parallel.workers; 1 = serial)')
     return ap.parse_args()
 
-def load_config(args):
-    cfg = {
+def default_config():
+    return {
         'data': 'data/analysis_dataset.csv',
         'outcome': 'outcome',
         'time': 'time',
@@ -42,12 +65,48 @@ def load_config(args):
         'group': 'group',
         'ref_group': 'control',
         'cluster': None,
-        'imputation': { 'method': 'none', 'iterative_max_iter': 10 },
+        'imputation': {
+            'method': 'none', 'iterative_max_iter': 10,
+            'm': 1,              # >1: multiple imputation, estimates pooled with Rubin's rules
+            'seed': 123,
+            'workers': None,     # processes for the m imputation chains
+            'save': None,        # write the fitted imputer(s) here (pickle)
+            'load': None,        # reuse saved imputer(s) instead of fitting
+        },
+        'io': {
+            'project_columns': True,      # read only the columns the analysis uses
+            'csv_engine': None,           # e.g. pyarrow
+            'dtypes': {},
+            'strings_as_category': False,
+            'parquet_cache': False,       # CSV → <file>.parquet sidecar on first read
+            'chunksize': None,            # rows per chunk: stream files larger than RAM
+            'downcast': True,             # streaming only: float64 → float32, small ints
+            'categories': {},             # streaming only: fixed {column: [levels]}; other
+                                          # string columns always become categoricals
+        },
+        # Cox engine: lifelines (Efron) or fast (sorted cumulative sums, Efron/Breslow, for 1M+ rows)
+        'cox': { 'engine': 'lifelines', 'ties': 'efron', 'strata': [], 'weights': None },
+        # Categoricals with more than max_levels levels get a sparse design (sparse: auto | true |
+        # false); absorb: fixed-effect variables fitted but left out of the OR table
+        'logistic': { 'sparse': 'auto', 'max_levels': 50, 'absorb': [] },
+        'km': { 'risk_times': [] },   # number-at-risk table times; [] = the KM plot's x ticks
+        'survival_metrics': { 'horizons': [], 'tau': None },  # AUC(t) horizons; Uno's C truncation
+        # k-fold CV (folds: 0 = off); out-of-fold predictions feed the ROC/calibration plots
+        'cv': { 'folds': 0, 'repeats': 1, 'seed': 123, 'workers': None },
+        # Per-level OR/HR of the exposure (default: group) within each subgroup variable
+        'subgroups': { 'variables': [], 'exposure': None, 'min_events': 5, 'workers': None },
+        'bootstrap': { 'n': 0, 'alpha': 0.05, 'seed': 123, 'workers': 1 },  # CIs; n: 0 = off
+        'cache': { 'enabled': True, 'dir': 'outputs/.cache' },
+        'parallel': { 'workers': None },
         'outputs': {
             'or_table_csv': 'outputs/logistic_or_table.csv',
             'hr_table_csv': 'outputs/cox_hr_table.csv',
             'ph_table_csv': 'outputs/cox_ph_test.csv',
+            'metrics_csv': 'outputs/model_metrics.csv',
+            'cv_folds_csv': 'outputs/cv_folds.csv',
+            'subgroups_csv': 'outputs/subgroups.csv',
             'km_plot': 'outputs/km_plot.png',
+            'km_risk_table_csv': 'outputs/km_risk_table.csv',
             'roc_plot': 'outputs/roc_curve.png',
             'calibration_plot': 'outputs/calibration_plot.png',
             'report_html': 'outputs/report.html',
@@ -62,17 +121,22 @@ def load_config(args):
             'include_docx': True,
         }
     }
+
+def merge_config(d, u):
+    """Recursively merge mapping u into d (in place) and return d."""
+    for k, v in u.items():
+        if isinstance(v, dict) and isinstance(d.get(k), dict):
+            merge_config(d[k], v)
+        else:
+            d[k] = v
+    return d
+
+def load_config(args):
+    cfg = default_config()
     if args.config:
         with open(args.config, 'r', encoding='utf-8') as f:
             loaded = yaml.safe_load(f) or {}
-        def merge(d, u):
-            for k, v in u.items():
-                if isinstance(v, dict) and isinstance(d.get(k), dict):
-                    merge(d[k], v)
-                else:
-                    d[k] = v
-            return d
-        cfg = merge(cfg, loaded)
+        cfg = merge_config(cfg, loaded)
         # SOURCE OF TRUTH: ignore any CLI overrides when --config is provided
         return cfg
     # Fallback: build cfg from CLI if no --config
@@ -86,12 +150,37 @@ def load_config(args):
     if args.cluster: cfg['cluster'] = args.cluster
     return cfg
 
-def render_html_report(cfg, or_df, hr_df, ph_df, auc, brier, c_index, km_plot_path):
-    env = Environment(loader=FileSystemLoader('python/templates'))
-    tpl = env.get_template('report_template.html')
-    or_html = or_df.to_html(index=False, float_format=lambda x: format(x, '.3g')) if or_df is not None else ''
-    hr_html = hr_df.to_html(index=False, float_format=lambda x: format(x, '.3g')) if hr_df is not None else ''
-    ph_html = ph_df.to_html(index=False, float_format=lambda x: format(x, '.3g')) if ph_df is not None else ''
+def _metric_text(metrics_df, name, value, alpha):
+    """Point estimate with its bootstrap CI when metrics_df has one."""
+    if metrics_df is not None and name in set(metrics_df['metric']):
+        row = metrics_df.set_index('metric').loc[name]
+        return format_ci(row['estimate'], row['ci_lower'], row['ci_upper'], alpha)
+    return format_ci(value)
+
+def _risk_wide(risk_df):
+    """Number at risk with one row per stratum and one column per time."""
+    wide = risk_df.pivot(index='stratum', columns='time', values='at_risk')
+    wide.columns = [format(c, 'g') for c in wide.columns]
+    return wide.rename_axis('at risk').reset_index()
+
+def _logrank_text(km):
+    lr = km['logrank'] if km else None
+    if not lr or lr['df'] < 1:
+        return ''
+    return f"χ² = {lr['test_statistic']:.2f} on {lr['df']} df, p = {lr['p_value']:.3g}"
+
+def _relative_to(path, directory):
+    """path as the HTML report links it (relative to the report's directory)."""
+    return Path(os.path.relpath(path, directory)).as_posix() if path else path
+
+def render_html_report(cfg, or_df, hr_df, ph_df, auc, brier, c_index, km_plot_path, metrics_df=None,
+                       subgroups_df=None, km=None):
+    # compiled once per process (batch workers reuse it) and bytecode-cached next to the stage cache
+    cache = cfg['cache']
+    jinja_dir = Path(cache.get('dir', 'outputs/.cache')) / 'jinja' if cache.get('enabled', True) else None
+    tpl = get_template('report_template.html', cache_dir=jinja_dir)
+    out_path = Path(cfg['outputs']['report_html'])
+    alpha = float(cfg['bootstrap'].get('alpha', 0.05))
     html = tpl.render(
         title=cfg['report']['title'],
         author=cfg['report']['author'],
@@ -106,25 +195,29 @@ def render_html_report(cfg, or_df, hr_df, ph_df, auc, brier, c_index, km_plot_pa
             'group': cfg['group'],
             'ref_group': cfg['ref_group'],
         },
-        imputation={'method': cfg['imputation'].get('method','none')},
+        imputation={'method': cfg['imputation'].get('method','none'), 'm': int(cfg['imputation'].get('m') or 1)},
         include_tables=bool(cfg['report'].get('include_tables', True)),
         include_km_plot=bool(cfg['report'].get('include_km_plot', True)),
-        or_table_html=or_html,
-        hr_table_html=hr_html,
-        ph_table_html=ph_html,
-        auc=f"{auc:.3f}",
-        brier=f"{brier:.3f}",
-        c_index=f"{c_index:.3f}",
-        km_plot_path=km_plot_path,
-        roc_plot_path=cfg['outputs']['roc_plot'],
-        calibration_plot_path=cfg['outputs']['calibration_plot'],
+        or_table_html=html_table(or_df),
+        hr_table_html=html_table(hr_df),
+        ph_table_html=html_table(ph_df),
+        metrics_table_html=html_table(metrics_df),
+        subgroups_table_html=html_table(subgroups_df, na_rep=''),
+        auc=_metric_text(metrics_df, 'auc', auc, alpha),
+        brier=_metric_text(metrics_df, 'brier', brier, alpha),
+        c_index=_metric_text(metrics_df, 'c_index', c_index, alpha),
+        km_plot_path=_relative_to(km_plot_path, out_path.parent),
+        km_risk_table_html=html_table(_risk_wide(km['risk_table'])) if km else '',
+        logrank=_logrank_text(km),
+        roc_plot_path=_relative_to(cfg['outputs']['roc_plot'], out_path.parent),
+        calibration_plot_path=_relative_to(cfg['outputs']['calibration_plot'], out_path.parent),
     )
-    out_path = Path(cfg['outputs']['report_html'])
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(html, encoding='utf-8')
     return str(out_path)
 
-def render_docx_report(cfg, or_df, hr_df, ph_df, auc, brier, c_index):
+def render_docx_report(cfg, or_df, hr_df, ph_df, auc, brier, c_index, metrics_df=None, subgroups_df=None,
+                       km=None):
     if not bool(cfg['report'].get('include_docx', True)):
         return None
     doc = Document()
@@ -143,122 +236,385 @@ def render_docx_report(cfg, or_df, hr_df, ph_df, auc, brier, c_index):
     p.add_run(f"Time / Status: {cfg['time']} / {cfg['status']}\n")
     p.add_run(f"Covariates: {', '.join(cfg['covars'])}\n")
     p.add_run(f"Group (KM): {cfg['group']} (ref: {cfg['ref_group']})\n")
-    p.add_run(f"Imputation: {cfg['imputation'].get('method','none')}\n")
+    m = int(cfg['imputation'].get('m') or 1)
+    p.add_run(f"Imputation: {cfg['imputation'].get('method','none')}"
+              + (f" (m={m} imputations, estimates pooled with Rubin's rules)" if m > 1 else '') + "\n")
 
     # Tables
     if bool(cfg['report'].get('include_tables', True)):
         doc.add_heading('Logistic Regression (Odds Ratios)', level=2)
-        t1 = doc.add_table(rows=1, cols=len(or_df.columns))
-        t1.style = 'Light List'
-        hdr = t1.rows[0].cells
-        for i, c in enumerate(or_df.columns): hdr[i].text = str(c)
-        for _, row in or_df.iterrows():
-            cells = t1.add_row().cells
-            for i, c in enumerate(or_df.columns):
-                val = row[c]
-                cells[i].text = str(round(val, 3)) if isinstance(val, (int, float)) else str(val)
+        add_docx_table(doc, or_df)
 
         doc.add_heading('Cox Proportional Hazards (Hazard Ratios)', level=2)
-        t2 = doc.add_table(rows=1, cols=len(hr_df.columns))
-        t2.style = 'Light List'
-        hdr = t2.rows[0].cells
-        for i, c in enumerate(hr_df.columns): hdr[i].text = str(c)
-        for _, row in hr_df.iterrows():
-            cells = t2.add_row().cells
-            for i, c in enumerate(hr_df.columns):
-                val = row[c]
-                cells[i].text = str(round(val, 3)) if isinstance(val, (int, float)) else str(val)
+        add_docx_table(doc, hr_df)
 
     # Diagnostics
+    alpha = float(cfg['bootstrap'].get('alpha', 0.05))
     doc.add_heading('Diagnostics — Logistic', level=2)
-    doc.add_paragraph(f"AUC: {auc:.3f}  |  Brier score: {brier:.3f}")
+    doc.add_paragraph(f"AUC: {_metric_text(metrics_df, 'auc', auc, alpha)}  |  "
+                      f"Brier score: {_metric_text(metrics_df, 'brier', brier, alpha)}")
     roc_path = cfg['outputs']['roc_plot']
     cal_path = cfg['outputs']['calibration_plot']
     if Path(roc_path).exists(): doc.add_picture(roc_path, width=Inches(5.5))
     if Path(cal_path).exists(): doc.add_picture(cal_path, width=Inches(5.5))
 
     doc.add_heading('Diagnostics — Cox', level=2)
-    doc.add_paragraph(f"Concordance index (c-index): {c_index:.3f}")
+    doc.add_paragraph(f"Concordance index (c-index): {_metric_text(metrics_df, 'c_index', c_index, alpha)}")
     if ph_df is not None and not ph_df.empty:
-        t3 = doc.add_table(rows=1, cols=len(ph_df.columns))
-        t3.style = 'Light List'
-        hdr = t3.rows[0].cells
-        for i, c in enumerate(ph_df.columns): hdr[i].text = str(c)
-        for _, row in ph_df.iterrows():
-            cells = t3.add_row().cells
-            for i, c in enumerate(ph_df.columns):
-                val = row[c]
-                cells[i].text = str(round(val, 3)) if isinstance(val, (int, float)) else str(val)
+        add_docx_table(doc, ph_df)
+    if km:
+        doc.add_heading('Kaplan–Meier', level=2)
+        km_path = cfg['outputs']['km_plot']
+        if Path(km_path).exists(): doc.add_picture(km_path, width=Inches(5.5))
+        if _logrank_text(km): doc.add_paragraph(f"Log-rank test: {_logrank_text(km)}")
+        add_docx_table(doc, _risk_wide(km['risk_table']))
+    if metrics_df is not None and bool(cfg['report'].get('include_tables', True)):
+        doc.add_heading('Model Metrics (bootstrap CIs)', level=2)
+        add_docx_table(doc, metrics_df)
+    if subgroups_df is not None and bool(cfg['report'].get('include_tables', True)):
+        doc.add_heading('Subgroup Analyses', level=2)
+        add_docx_table(doc, subgroups_df)
 
     out_docx = Path(cfg['outputs']['report_docx'])
     out_docx.parent.mkdir(parents=True, exist_ok=True)
     doc.save(out_docx)
     return str(out_docx)
 
-def main():
-    args = parse_args()
-    if not args.config:
-        print('[Warning] --config not provided. Falling back to CLI parameters as configuration.')
-    cfg = load_config(args)
+# --- Pipeline stages (each is cached by stage_cache on its inputs + config slice) ---
+
+def needed_columns(cfg):
+    """Columns the analysis reads: outcome, time, status, covariates, group, cluster, subgroups,
+    Cox strata and weights, absorbed logistic fixed effects."""
+    cols = [cfg['outcome'], cfg['time'], cfg['status'], *cfg['covars'], cfg['group'], cfg.get('cluster'),
+            *(cfg['subgroups'].get('variables') or []), *_cox_extra(cfg),
+            *_logistic_options(cfg)['absorb']]
+    return list(dict.fromkeys(c for c in cols if c))
+
+def _cox_extra(cfg):
+    """Cox strata and weight columns (fitted alongside the covariates, never imputed)."""
+    cx = cfg['cox']
+    strata = [cx['strata']] if isinstance(cx.get('strata'), str) else list(cx.get('strata') or [])
+    return strata + ([cx['weights']] if cx.get('weights') else [])
+
+def _cox_options(cfg):
+    cx = cfg['cox']
+    return {'strata': cx.get('strata') or None, 'weights_col': cx.get('weights'),
+            'engine': cx.get('engine', 'lifelines'), 'ties': cx.get('ties', 'efron')}
+
+def _logistic_options(cfg):
+    lg = cfg['logistic']
+    absorb = lg.get('absorb')
+    return {'sparse_design': lg.get('sparse', 'auto'), 'max_levels': int(lg.get('max_levels', 50)),
+            'absorb': [absorb] if isinstance(absorb, str) else list(absorb or [])}
 
-    # Load data & basic preparation
-    df = read_clean(cfg['data'])
+def required_columns(cfg):
+    """Columns a run cannot use rows without (outcome, time, status)."""
+    return [c for c in (cfg['outcome'], cfg['time'], cfg['status']) if c]
+
+def read_data(cfg, columns=None, required=None):
+    """Read and clean cfg['data']. required: columns whose missing rows the streaming reader
+    may drop early (default: this run's required_columns; a frame shared by several runs
+    must pass only the columns every run requires)."""
+    io = cfg['io']
+    if io.get('chunksize'):
+        # Streaming: rows missing a required column are dropped chunk by chunk
+        return read_clean_chunked(cfg['data'], columns=columns,
+                                  required=required_columns(cfg) if required is None else required,
+                                  chunksize=int(io['chunksize']), dtypes=io.get('dtypes') or None,
+                                  categories=io.get('categories') or None,
+                                  downcast=bool(io.get('downcast', True)))
+    return read_clean(cfg['data'], columns=columns, dtypes=io.get('dtypes') or None,
+                      csv_engine=io.get('csv_engine'),
+                      strings_as_category=bool(io.get('strings_as_category', False)),
+                      parquet_cache=bool(io.get('parquet_cache', False)))
+
+def _stage_load(cfg, raw=None):
+    # raw: an already read_clean-ed frame shared by the batch runner
+    cols = needed_columns(cfg) if cfg['io'].get('project_columns', True) else None
+    if raw is None:
+        df = read_data(cfg, cols)
+    else:
+        df = raw[[c for c in cols if c in raw.columns]] if cols else raw
     # Drop rows with missing target/time/status
     df = df.dropna(subset=[cfg['outcome'], cfg['time'], cfg['status']])
-
     # Group reference for KM
     if cfg['group'] in df.columns:
-        df = set_categorical_ref(df, cfg['group'], cfg['ref_group'])
-
-    # Impute covariates as configured
-    df = impute_covariates(df, cfg['covars'], method=cfg['imputation']['method'],
-                           iterative_max_iter=int(cfg['imputation'].get('iterative_max_iter', 10)))
-
-    # Logistic model
-    log_res = fit_logistic(df, cfg['outcome'], cfg['covars'], cluster=cfg.get('cluster'))
-    or_df = or_table(log_res)
-    or_csv = Path(cfg['outputs']['or_table_csv']); or_csv.parent.mkdir(parents=True, exist_ok=True)
-    or_df.to_csv(or_csv, index=False)
-
-    # Logistic diagnostics
-    y_true = df[cfg['outcome']].astype(int)
-    y_prob = log_res.predict()
-    mets = logistic_diagnostics(y_true, y_prob)
-    auc, brier = float(mets['auc']), float(mets['brier'])
+        # dropna already returned a fresh frame; no need for another copy
+        df = set_categorical_ref(df, cfg['group'], cfg['ref_group'], inplace=True)
+    return df
+
+def _stage_impute(cfg, df, inplace=True):
+    """Imputed frame, or a list of m frames for multiple imputation."""
+    imp = cfg['imputation']
+    method, max_iter = imp['method'], int(imp.get('iterative_max_iter', 10))
+    m = int(imp.get('m') or 1)
+    if imp.get('load'):
+        imputers = load_imputers(imp['load'])
+        frames = impute_all(imputers, df)
+    elif m > 1:
+        imputers, frames = multiple_impute(df, cfg['covars'], m, method, max_iter,
+                                           seed=int(imp.get('seed', 123)), workers=imp.get('workers'))
+    elif imp.get('save'):
+        imputers = [fit_imputer(df, cfg['covars'], method, max_iter)]
+        frames = [imputers[0].transform(df, inplace=inplace)]
+    else:
+        # df is the load stage's own frame (already pickled if cached); fill it in place
+        # unless another stage (cv) still needs the unimputed rows
+        return impute_covariates(df, cfg['covars'], method=method, iterative_max_iter=max_iter, inplace=inplace)
+    if imp.get('save'):
+        save_imputers(imputers, imp['save'])
+    return frames if len(frames) > 1 else frames[0]
+
+def _imputations(data):
+    return data if isinstance(data, list) else [data]
+
+def _cv_enabled(cfg):
+    return int(cfg['cv'].get('folds') or 0) > 1
+
+def _stage_cv(cfg, df):
+    cv = cfg['cv']
+    return cross_validate(df, cfg['outcome'], cfg['covars'], time=cfg['time'], status=cfg['status'],
+                          imputation=cfg['imputation'], k=int(cv['folds']), repeats=int(cv.get('repeats', 1)),
+                          seed=int(cv.get('seed', 123)), workers=cv.get('workers'), cluster=cfg.get('cluster'),
+                          cox=_cox_options(cfg), logistic=_logistic_options(cfg))
+
+def _stage_subgroups(cfg, data):
+    # One design for all levels; with multiple imputation, the first imputed frame
+    sg = cfg['subgroups']
+    exposure = sg.get('exposure') or (cfg['group'] if cfg['group'] in cfg['covars'] else cfg['covars'][0])
+    return subgroup_analysis(_imputations(data)[0], sg['variables'], cfg['covars'], outcome=cfg['outcome'],
+                             time=cfg['time'], status=cfg['status'], exposure=exposure,
+                             cluster=cfg.get('cluster'), min_events=int(sg.get('min_events', 5)),
+                             workers=sg.get('workers'), cox=_cox_options(cfg), logistic=_logistic_options(cfg))
+
+def _stage_logistic(cfg, data):
+    # Multiple imputation: one fit per imputed frame, Rubin-pooled ORs, mean predictions
+    dfs = _imputations(data)
+    opts = _logistic_options(cfg)
+    fits = [fit_logistic(d, cfg['outcome'], cfg['covars'], cluster=cfg.get('cluster'), **opts) for d in dfs]
+    y_true = dfs[0][cfg['outcome']].astype(int).to_numpy()
+    y_prob = np.mean([np.asarray(r.predict()) for r in fits], axis=0)
+    bs = cfg['bootstrap']
+    mets = bootstrap_logistic(y_true, y_prob, n_boot=int(bs.get('n', 0) or 0), alpha=float(bs.get('alpha', 0.05)),
+                              seed=int(bs.get('seed', 123)), workers=bs.get('workers', 1))
+    est = mets.set_index('metric')['estimate']
+    or_df = pool_logistic(fits) if len(fits) > 1 else or_table(fits[0])
+    return {'or_df': or_df, 'y_true': y_true, 'y_prob': y_prob,
+            'auc': float(est['auc']), 'brier': float(est['brier']), 'metrics_df': mets}
+
+def _stage_logistic_plots(cfg, log, cv=None):
+    # With CV, plot the pooled out-of-fold predictions (all repeats) instead of the
+    # optimistic in-sample fit
+    y_true, y_prob = (cv['oof']['y_true'], cv['oof']['y_prob']) if cv else (log['y_true'], log['y_prob'])
+    Path(cfg['outputs']['roc_plot']).parent.mkdir(parents=True, exist_ok=True)
+    Path(cfg['outputs']['calibration_plot']).parent.mkdir(parents=True, exist_ok=True)
     save_roc_plot(y_true, y_prob, cfg['outputs']['roc_plot'])
     save_calibration_plot(y_true, y_prob, cfg['outputs']['calibration_plot'])
 
-    # Cox model
-    cph = cox_fit(df, cfg['time'], cfg['status'], cfg['covars'])
-    hr_df = hr_table(cph)
-    hr_csv = Path(cfg['outputs']['hr_table_csv']); hr_csv.parent.mkdir(parents=True, exist_ok=True)
-    hr_df.to_csv(hr_csv, index=False)
-
-    # PH test table
-    ph_df = cox_ph_test_table(cph, df[[cfg['time'], cfg['status']] + cfg['covars']].dropna(), cfg['time'], cfg['status'])
-    ph_csv = Path(cfg['outputs']['ph_table_csv']); ph_csv.parent.mkdir(parents=True, exist_ok=True)
-    ph_df.to_csv(ph_csv, index=False)
-
-    # KM plot
-    km_plot_path = None
-    if bool(cfg['report'].get('include_km_plot', True)):
-        ax = km_fit_plot(df, cfg['time'], cfg['status'], group=cfg['group'])
-        km_png = Path(cfg['outputs']['km_plot']); km_png.parent.mkdir(parents=True, exist_ok=True)
-        ax.figure.savefig(km_png, dpi=300, bbox_inches='tight')
-        km_plot_path = str(km_png)
-
-    # Reports
-    html_path = render_html_report(cfg, or_df, hr_df, ph_df, auc, brier, float(getattr(cph, 'concordance_index_', float('nan'))), km_plot_path)
-    docx_path = None
+def _stage_cox(cfg, data):
+    dfs = _imputations(data)
+    cols = list(dict.fromkeys([cfg['time'], cfg['status']] + cfg['covars'] + _cox_extra(cfg)))
+    opts = _cox_options(cfg)
+    # later imputations warm-start from the first fit (same rows, nearby coefficients)
+    cphs = [cox_fit(dfs[0], cfg['time'], cfg['status'], cfg['covars'], **opts)]
+    cphs += [cox_fit(df, cfg['time'], cfg['status'], cfg['covars'], init=cphs[0], **opts) for df in dfs[1:]]
+    cph, d = cphs[0], dfs[0][cols].dropna()
+    # PH test on the first imputation; risk averaged over imputations
+    ph_df = cox_ph_test_table(cph, d, cfg['time'], cfg['status'])
+    risk = np.mean([cox_predict(c, df[cols].dropna()) for c, df in zip(cphs, dfs)], axis=0)
+    bs = cfg['bootstrap']
+    mets = bootstrap_concordance(d[cfg['time']], d[cfg['status']], risk,
+                                 n_boot=int(bs.get('n', 0) or 0), alpha=float(bs.get('alpha', 0.05)),
+                                 seed=int(bs.get('seed', 123)), workers=bs.get('workers', 1))
+    # Uno's C and time-dependent AUC on the fitted rows (point estimates)
+    sm = cfg['survival_metrics']
+    t, e = d[cfg['time']].to_numpy(), d[cfg['status']].to_numpy()
+    hz = [float(h) for h in sm.get('horizons') or []]
+    extra = [('uno_c', uno_c(t, e, risk, tau=sm.get('tau')))]
+    extra += [(f'auc_t={h:g}', a) for h, a in zip(hz, cumulative_dynamic_auc(t, e, risk, hz))] if hz else []
+    mets = pd.concat([mets, pd.DataFrame({'metric': [m for m, _ in extra], 'estimate': [v for _, v in extra],
+                                          'ci_lower': np.nan, 'ci_upper': np.nan, 'n_boot': 0})],
+                     ignore_index=True)
+    if len(cphs) > 1:
+        return {'hr_df': pool_cox(cphs), 'ph_df': ph_df, 'metrics_df': mets,
+                'c_index': float(mets.set_index('metric').loc['c_index', 'estimate'])}
+    return {'hr_df': hr_table(cph), 'ph_df': ph_df, 'metrics_df': mets,
+            'c_index': float(getattr(cph, 'concordance_index_', float('nan')))}
+
+def _stage_km_plot(cfg, data):
+    df = _imputations(data)[0]  # time/status/group are not imputed
+    t, e = df[cfg['time']], df[cfg['status']]
+    strata = df[cfg['group']] if cfg['group'] in df.columns else None
+    ax = km_fit_plot(df, cfg['time'], cfg['status'], group=cfg['group'], km=km_estimate(t, e, strata))
+    km_png = Path(cfg['outputs']['km_plot']); km_png.parent.mkdir(parents=True, exist_ok=True)
+    ax.figure.savefig(km_png, dpi=300, bbox_inches='tight')
+    times = cfg['km'].get('risk_times') or [x for x in ax.get_xticks() if 0 <= x <= t.max()]
+    plt.close(ax.figure)
+    return {'risk_table': risk_table(t, e, strata, times),
+            'logrank': logrank_test(t, e, strata) if strata is not None else None}
+
+# --- Stage wrappers run by the DAG scheduler; each returns (value, cache log records) ---
+
+def _cached(cache_opts, name, key, files, fn, *deps):
+    """Run fn on dependency values through a stage cache rebuilt from cache_opts (worker-safe)."""
+    cache = StageCache(*cache_opts)
+    value = cache.run(name, key, lambda: fn(*(d[0] for d in deps)), files=files)
+    return value, cache.log
+
+def _metrics_df(log, cox, cv=None):
+    parts = [log['metrics_df'], cox['metrics_df']] + ([summarize_folds(cv['folds'])] if cv else [])
+    return pd.concat(parts, ignore_index=True)
+
+def _extras(names, rest):
+    """Values of the report's dependencies after logistic and cox, by stage name."""
+    return {n: r[0] for n, r in zip(names, rest)}
+
+def _stage_report_html(cfg, km_plot_path, extra_names, log_r, cox_r, *rest):
+    log, cox = log_r[0], cox_r[0]
+    ex = _extras(extra_names, rest)
+    path = render_html_report(cfg, log['or_df'], cox['hr_df'], cox['ph_df'],
+                              log['auc'], log['brier'], cox['c_index'], km_plot_path,
+                              metrics_df=_metrics_df(log, cox, ex.get('cv')), subgroups_df=ex.get('subgroups'),
+                              km=ex.get('km_plot'))
+    return path, []
+
+def _stage_report_docx(cfg, extra_names, log_r, cox_r, *rest):
+    log, cox = log_r[0], cox_r[0]
+    ex = _extras(extra_names, rest)
+    path = render_docx_report(cfg, log['or_df'], cox['hr_df'], cox['ph_df'],
+                              log['auc'], log['brier'], cox['c_index'],
+                              metrics_df=_metrics_df(log, cox, ex.get('cv')), subgroups_df=ex.get('subgroups'),
+                              km=ex.get('km_plot'))
+    return path, []
+
+def _write_csv(df, path):
+    out = Path(path); out.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(out, index=False)
+    return out
+
+def run_pipeline(cfg, force=False, use_cache=True, workers=None, raw=None, data_digest=None):
+    """Run the full analysis for one config; returns a dict of output paths and timings.
+
+    raw / data_digest let a caller (run_batch.py) share one read_clean-ed frame and its
+    file hash across many runs on the same data.
+    """
+    cache = StageCache(cfg['cache'].get('dir', 'outputs/.cache'),
+                       enabled=bool(cfg['cache'].get('enabled', True)) and use_cache,
+                       force=force)
+    opts = cache.options()
+    if workers is None:
+        workers = cfg['parallel'].get('workers')
+
+    # Stage keys chain upstream keys, so a change in the data or an early config slice
+    # invalidates everything downstream of it and nothing else
+    k_load = stage_key('load', data_digest or file_digest(cfg['data']),
+                       {k: cfg[k] for k in ('outcome', 'time', 'status', 'group', 'ref_group', 'io')},
+                       needed_columns(cfg) if cfg['io'].get('project_columns', True) else None)
+    imp = cfg['imputation']
+    k_imp = stage_key('impute', k_load, cfg['covars'], {k: v for k, v in imp.items() if k != 'workers'},
+                      file_digest(imp['load']) if imp.get('load') else None)
+    boot = {k: cfg['bootstrap'].get(k) for k in ('n', 'alpha', 'seed')}
+    k_log = stage_key('logistic', k_imp, cfg['outcome'], cfg['covars'], cfg.get('cluster'), boot, cfg['logistic'])
+    k_logp = stage_key('logistic_plots', k_log)
+    k_cox = stage_key('cox', k_imp, cfg['time'], cfg['status'], cfg['covars'], boot, cfg['survival_metrics'],
+                      cfg['cox'])
+    k_km = stage_key('km_plot', k_imp, cfg['time'], cfg['status'], cfg['group'], cfg['km'])
+    with_cv = _cv_enabled(cfg)
+    k_cv = stage_key('cv', k_load, cfg['outcome'], cfg['covars'], cfg['time'], cfg['status'],
+                     cfg.get('cluster'), cfg['imputation'], cfg['cox'], cfg['logistic'],
+                     {k: cfg['cv'].get(k) for k in ('folds', 'repeats', 'seed')})
+    if with_cv:
+        k_logp = stage_key('logistic_plots', k_log, k_cv)
+    sg = cfg['subgroups']
+    with_sg = bool(sg.get('variables'))
+    k_sg = stage_key('subgroups', k_imp, cfg['outcome'], cfg['time'], cfg['status'], cfg['covars'],
+                     cfg['group'], cfg.get('cluster'), cfg['cox'], cfg['logistic'],
+                     {k: sg.get(k) for k in ('variables', 'exposure', 'min_events')})
+
+    # After imputation the logistic branch (fit → plots) and the Cox branch (fit + PH test,
+    # KM plot) are independent and run concurrently; reports join both branches
+    outs = cfg['outputs']
+    include_km = bool(cfg['report'].get('include_km_plot', True))
+    branch = {
+        'logistic': (k_log, partial(_stage_logistic, cfg), ['data'], []),
+        'logistic_plots': (k_logp, partial(_stage_logistic_plots, cfg), ['logistic'] + (['cv'] if with_cv else []),
+                           [outs['roc_plot'], outs['calibration_plot']]),
+        'cox': (k_cox, partial(_stage_cox, cfg), ['data'], []),
+    }
+    if include_km:
+        branch['km_plot'] = (k_km, partial(_stage_km_plot, cfg), ['data'], [outs['km_plot']])
+    if with_cv:
+        # Folds run in their own process pool, so the stage itself stays in the parent
+        branch['cv'] = (k_cv, partial(_stage_cv, cfg), ['load'], [])
+    if with_sg:
+        branch['subgroups'] = (k_sg, partial(_stage_subgroups, cfg), ['data'], [])
+
+    # Cache hits are loaded up front, so they neither wait on nor trigger data loading
+    seeded, stages = {}, {}
+    for name, (key, fn, deps, files) in branch.items():
+        if cache.has(name, key, files):
+            seeded[name] = _cached(opts, name, key, files, fn)
+        else:
+            stages[name] = (partial(_cached, opts, name, key, files, fn), deps, name in ('cv', 'subgroups'))
+    # Upstream of everything: run in the parent so the frames are not shipped back
+    if any('data' in deps for _, deps, _ in stages.values()):
+        stages['data'] = (partial(_cached, opts, 'impute', k_imp, [imp['save']] if imp.get('save') else [],
+                                  partial(_stage_impute, cfg, inplace='cv' not in stages)), ['load'], True)
+    if any('load' in deps for _, deps, _ in stages.values()):
+        stages['load'] = (partial(_cached, opts, 'load', k_load, [], partial(_stage_load, cfg, raw=raw)), [], True)
+    km_plot_path = str(Path(outs['km_plot'])) if include_km else None
+    extra_names = [n for n, on in (('cv', with_cv), ('subgroups', with_sg), ('logistic_plots', True),
+                                   ('km_plot', include_km)) if on]
+    report_deps = ['logistic', 'cox'] + extra_names
+    stages['report_html'] = (partial(_stage_report_html, cfg, km_plot_path, extra_names), report_deps, False)
     if bool(cfg['report'].get('include_docx', True)):
-        docx_path = render_docx_report(cfg, or_df, hr_df, ph_df, auc, brier, float(getattr(cph, 'concordance_index_', float('nan'))))
-
-    print(f'Saved OR table → {or_csv}')
-    print(f'Saved HR table → {hr_csv}')
-    print(f'Saved PH test table → {ph_csv}')
-    if km_plot_path: print(f'Saved KM plot → {km_plot_path}')
-    print(f'Saved HTML report → {html_path}')
-    if docx_path: print(f'Saved DOCX report → {docx_path}')
+        stages['report_docx'] = (partial(_stage_report_docx, cfg, extra_names), report_deps, False)
+
+    results, timings = run_dag(stages, workers=workers, results=seeded)
+    for _, records in results.values():
+        cache.log.extend(records)
+    if cache.enabled:
+        cache.write_log()
+
+    log, cox = results['logistic'][0], results['cox'][0]
+    cv = results['cv'][0] if with_cv else None
+    sub = results['subgroups'][0] if with_sg else None
+    km = results['km_plot'][0] if include_km else None
+    return {
+        'or_table_csv': str(_write_csv(log['or_df'], outs['or_table_csv'])),
+        'hr_table_csv': str(_write_csv(cox['hr_df'], outs['hr_table_csv'])),
+        'ph_table_csv': str(_write_csv(cox['ph_df'], outs['ph_table_csv'])),
+        'metrics_csv': str(_write_csv(_metrics_df(log, cox, cv), outs['metrics_csv'])),
+        'cv_folds_csv': str(_write_csv(cv['folds'], outs['cv_folds_csv'])) if cv else None,
+        'subgroups_csv': str(_write_csv(sub, outs['subgroups_csv'])) if sub is not None else None,
+        'km_plot': km_plot_path,
+        'km_risk_table_csv': str(_write_csv(km['risk_table'], outs['km_risk_table_csv'])) if km else None,
+        'report_html': results['report_html'][0],
+        'report_docx': results['report_docx'][0] if 'report_docx' in results else None,
+        'auc': log['auc'], 'brier': log['brier'], 'c_index': cox['c_index'],
+        'timings': format_timings(stages, timings),
+    }
+
+def main():
+    args = parse_args()
+    if not args.config:
+        print('[Warning] --config not provided. Falling back to CLI parameters as configuration.')
+    cfg = load_config(args)
+
+    force = True if args.force == [] else (args.force or False)
+    out = run_pipeline(cfg, force=force, use_cache=not args.no_cache, workers=args.workers)
+
+    print(out['timings'])
+    print(f"Saved OR table → {out['or_table_csv']}")
+    print(f"Saved HR table → {out['hr_table_csv']}")
+    print(f"Saved PH test table → {out['ph_table_csv']}")
+    print(f"Saved metrics table → {out['metrics_csv']}")
+    if out['cv_folds_csv']: print(f"Saved CV fold metrics → {out['cv_folds_csv']}")
+    if out['subgroups_csv']: print(f"Saved subgroup table → {out['subgroups_csv']}")
+    if out['km_plot']: print(f"Saved KM plot → {out['km_plot']}")
+    if out['km_risk_table_csv']: print(f"Saved KM risk table → {out['km_risk_table_csv']}")
+    print(f"Saved HTML report → {out['report_html']}")
+    if out['report_docx']: print(f"Saved DOCX report → {out['report_docx']}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,129 @@
+# run_batch.py — run many analysis configs on data that is loaded and cleaned once
+from __future__ import annotations
+import argparse
+import copy
+import csv
+import json
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from run_analysis import default_config, merge_config, run_pipeline, read_data, needed_columns, required_columns
+from snippets.stage_cache import file_digest
+
+# data source -> (read_clean frame, file digest); set in the parent before workers fork,
+# so forked workers share the frames copy-on-write instead of re-reading the CSV
+_FRAMES: dict[str, tuple] = {}
+
+INDEX_FIELDS = ['run', 'config', 'data', 'status', 'seconds', 'auc', 'brier', 'c_index',
+                'or_table_csv', 'hr_table_csv', 'ph_table_csv', 'metrics_csv', 'cv_folds_csv', 'subgroups_csv',
+                'km_plot', 'km_risk_table_csv', 'report_html', 'report_docx', 'error']
+
+def parse_args():
+    ap = argparse.ArgumentParser(description='Run run_analysis.py over many configs in one process pool')
+    ap.add_argument('configs', nargs='+', help='YAML configs; a config with a runs: list expands to one run per entry')
+    ap.add_argument('--workers', type=int, default=None, help='Parallel runs (default: all cores; 1 = serial)')
+    ap.add_argument('--index', default='outputs/batch_index.csv', help='Summary index of all outputs')
+    ap.add_argument('--force', action='store_true', help='Recompute all cached stages')
+    ap.add_argument('--no_cache', action='store_true')
+    return ap.parse_args()
+
+def _nest_outputs(cfg: dict, name: str):
+    """Put each output of a run under <output dir>/<run name>/ so runs do not overwrite each other."""
+    for k, p in cfg['outputs'].items():
+        cfg['outputs'][k] = str(Path(p).parent / name / Path(p).name)
+
+def expand_configs(paths: list[str]) -> list[tuple[str, str, dict]]:
+    """(run name, config path, merged cfg) for every run.
+
+    A config may hold a runs: list; each entry (optionally with a name:) is merged over the
+    rest of that config. Runs that do not set outputs: get them nested under their name.
+    """
+    runs, seen = [], set()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            loaded = yaml.safe_load(f) or {}
+        entries = loaded.pop('runs', None) or [{}]
+        for i, entry in enumerate(entries):
+            entry = dict(entry)
+            name = str(entry.pop('name', Path(path).stem if len(entries) == 1 else f'{Path(path).stem}_{i + 1}'))
+            while name in seen:
+                name += '_'
+            seen.add(name)
+            cfg = merge_config(merge_config(default_config(), copy.deepcopy(loaded)), entry)
+            if len(paths) > 1 or len(entries) > 1:
+                if 'outputs' not in entry:
+                    _nest_outputs(cfg, name)
+            runs.append((name, str(path), cfg))
+    return runs
+
+def _source(cfg: dict) -> str:
+    """Runs with the same data file and io settings share one loaded frame."""
+    return json.dumps([cfg['data'], cfg['io']], sort_keys=True, default=str)
+
+def _init_worker(frames):
+    global _FRAMES
+    _FRAMES = frames
+
+def _run_one(job) -> dict:
+    name, src, cfg, force, use_cache = job
+    rec = {'run': name, 'config': src, 'data': cfg['data'], 'status': 'ok', 'error': ''}
+    t0 = time.perf_counter()
+    try:
+        raw, digest = _FRAMES[_source(cfg)]
+        out = run_pipeline(cfg, force=force, use_cache=use_cache, workers=1, raw=raw, data_digest=digest)
+        rec.update({k: v for k, v in out.items() if k in INDEX_FIELDS})
+    except Exception as e:
+        rec['status'], rec['error'] = 'failed', f'{type(e).__name__}: {e}'
+    rec['seconds'] = round(time.perf_counter() - t0, 2)
+    print(f"[{rec['status']}] {name} ({rec['seconds']}s) {rec['error']}")
+    return rec
+
+def main():
+    args = parse_args()
+    runs = expand_configs(args.configs)
+
+    # Load and clean each distinct data source once (union of the columns its runs need),
+    # before any worker starts
+    groups: dict[str, list[dict]] = {}
+    for _, _, cfg in runs:
+        groups.setdefault(_source(cfg), []).append(cfg)
+    frames = {}
+    for src, cfgs in groups.items():
+        cfg = cfgs[0]
+        cols = None
+        if all(c['io'].get('project_columns', True) for c in cfgs):
+            cols = list(dict.fromkeys(col for c in cfgs for col in needed_columns(c)))
+        # The streaming reader may only drop rows that no run sharing the frame can use;
+        # each run drops its own missing outcome/time/status in _stage_load
+        required = [c for c in required_columns(cfg) if all(c in required_columns(o) for o in cfgs)]
+        t0 = time.perf_counter()
+        frames[src] = (read_data(cfg, cols, required=required), file_digest(cfg['data']))
+        print(f"Loaded {cfg['data']} ({len(frames[src][0])} rows) in {time.perf_counter() - t0:.2f}s")
+    _init_worker(frames)
+
+    jobs = [(name, src, cfg, args.force, not args.no_cache) for name, src, cfg in runs]
+    t0 = time.perf_counter()
+    if args.workers == 1:
+        records = [_run_one(j) for j in jobs]
+    else:
+        # fork shares the warmed interpreter (imports + frames); spawn platforms pickle frames once per worker
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(frames,)) as pool:
+            records = list(pool.map(_run_one, jobs))
+
+    index = Path(args.index); index.parent.mkdir(parents=True, exist_ok=True)
+    with open(index, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=INDEX_FIELDS, extrasaction='ignore')
+        w.writeheader()
+        w.writerows(records)
+    n_ok = sum(r['status'] == 'ok' for r in records)
+    print(f'{n_ok}/{len(records)} runs succeeded in {time.perf_counter() - t0:.1f}s')
+    print(f'Saved batch index → {index}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# coxph.py — high-throughput Cox proportional hazards (Efron/Breslow) on sorted cumulative sums
+from __future__ import annotations
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from .survival_metrics import harrell_c
+
+__all__ = ["FastCoxPH"]
+
+_TIES = {'efron', 'breslow'}
+
+class FastCoxPH:
+    """Cox model fitted by Newton–Raphson on risk-set sums from one sort (picklable).
+
+    Rows are sorted once by (stratum, time descending). Then every risk-set sum is a
+    cumulative sum, and the Hessian's S2 terms fold into one weighted X'X per iteration:
+    O(n p^2) time, O(n p) memory, no per-event-time loop. Supports Efron or Breslow ties,
+    strata (separate baseline hazards), case weights and warm starts (init: coefficients
+    or a previous fit). Exposes the CoxPHFitter attributes the pipeline reads:
+    params_, standard_errors_, variance_matrix_, summary, log_likelihood_,
+    concordance_index_ and predict_log_partial_hazard.
+    """
+
+    def __init__(self, ties: str = 'efron', alpha: float = 0.05, tol: float = 1e-9, max_iter: int = 100):
+        ties = (ties or 'efron').lower()
+        if ties not in _TIES:
+            raise ValueError("ties must be one of: efron | breslow")
+        self.ties = ties
+        self.alpha = alpha
+        self.tol = tol
+        self.max_iter = max_iter
+
+    # --- data layout -----------------------------------------------------------------
+
+    def _prepare(self, X, t, e, strata, weights):
+        """Standardised design sorted by (stratum, time desc) plus the tie-group index."""
+        Z = (np.asarray(X, dtype=np.float64) - self._norm_mean.values) / self._norm_std.values
+        t = np.asarray(t, dtype=np.float64)
+        e = np.asarray(e, dtype=np.float64)
+        w = np.ones(len(t)) if weights is None else np.asarray(weights, dtype=np.float64)
+        codes = np.zeros(len(t), dtype=np.int64) if strata is None else pd.factorize(np.asarray(strata), sort=True)[0]
+        order = np.argsort(-t)
+        order = order[np.argsort(codes[order], kind='stable')]
+        # covariates as rows (p, n): row-wise cumulative sums and reductions stay contiguous
+        ZT = np.ascontiguousarray(Z[order].T)
+        t, e, w, codes = t[order], e[order], w[order], codes[order]
+        new = np.r_[True, (codes[1:] != codes[:-1]) | (t[1:] != t[:-1])]
+        gstart = np.flatnonzero(new)                  # tie groups: one (stratum, time) each
+        gid = np.cumsum(new) - 1
+        # first group of each group's stratum and of the next stratum
+        gcodes = codes[gstart]
+        first_g = np.searchsorted(gcodes, gcodes, side='left')
+        next_first = np.searchsorted(gcodes, gcodes, side='right')
+        deaths = np.add.reduceat(e, gstart)
+        ev = np.flatnonzero(deaths > 0)
+        m = deaths[ev].astype(np.int64)
+        rep = np.repeat(np.arange(len(ev)), m)
+        if self.ties == 'efron':
+            frac = (np.arange(m.sum()) - np.repeat(np.cumsum(m) - m, m)) / m[rep]
+        else:
+            frac = np.zeros(m.sum())
+        wbar = (np.add.reduceat(w * e, gstart)[ev] / m)[rep]
+        return {'ZT': ZT, 'e': e, 'w': w, 'order': order, 'gstart': gstart, 'gid': gid,
+                'first_g': first_g, 'next_first': next_first, 'ev': ev, 'rep': rep, 'frac': frac,
+                'wbar': wbar, 'G': len(gstart)}
+
+    def _risk_terms(self, s, beta):
+        """Per expanded death (group, l): D = S0 - f T0 and U = S1 - f T1 (U as (p, deaths))."""
+        ZT, e, w, gstart, ev, rep, frac = (s[k] for k in ('ZT', 'e', 'w', 'gstart', 'ev', 'rep', 'frac'))
+        eta = beta @ ZT
+        phi = w * np.exp(eta)
+        pZ = ZT * phi
+        # per tie group, then cumulated over groups: the risk set of a group is every group
+        # from its stratum's first (latest time) up to itself
+        c0 = np.r_[0.0, np.cumsum(np.add.reduceat(phi, gstart))]
+        c1 = np.hstack([np.zeros((len(ZT), 1)), np.cumsum(np.add.reduceat(pZ, gstart, axis=1), axis=1)])
+        end, first = ev + 1, s['first_g'][ev]
+        S0 = c0[end] - c0[first]
+        S1 = c1[:, end] - c1[:, first]
+        pe = phi * e
+        T0 = np.add.reduceat(pe, gstart)[ev]          # tied deaths
+        T1 = np.add.reduceat(pZ * e, gstart, axis=1)[:, ev]
+        D = S0[rep] - frac * T0[rep]
+        U = S1[:, rep] - frac * T1[:, rep]
+        return eta, phi, D, U
+
+    def _derivatives(self, s, beta):
+        ZT, e, w, gid, rep, frac, wbar, G = (s[k] for k in ('ZT', 'e', 'w', 'gid', 'rep', 'frac', 'wbar', 'G'))
+        eta, phi, D, U = self._risk_terms(s, beta)
+        we = w * e
+        ll = we @ eta - wbar @ np.log(D)
+        a = wbar / D
+        grad = ZT @ we - U @ a
+        H = (U * (a / D)) @ U.T
+        # sum_g A_g S2_g - B_g T2_g = Z' diag(phi * (A summed over groups at or after the row's
+        # time in its stratum - B of its own group for deaths)) Z
+        A = np.zeros(G)
+        B = np.zeros(G)
+        A[s['ev']] = np.bincount(rep, weights=a, minlength=len(s['ev']))
+        B[s['ev']] = np.bincount(rep, weights=a * frac, minlength=len(s['ev']))
+        cA = np.r_[np.cumsum(A[::-1])[::-1], 0.0]
+        cumA = cA[:-1] - cA[s['next_first']]
+        r = phi * (cumA[gid] - e * B[gid])
+        H -= (ZT * r) @ ZT.T
+        return ll, grad, H
+
+    # --- fitting ---------------------------------------------------------------------
+
+    def fit(self, X, t: Sequence, e: Sequence, strata: Sequence | None = None,
+            weights: Sequence | None = None, init=None) -> "FastCoxPH":
+        """Fit on X (DataFrame or (n, p) array; column names from a DataFrame), durations t and
+        events e. init: starting coefficients (original scale) or a previous fit."""
+        columns = list(X.columns) if isinstance(X, pd.DataFrame) else [f'x{j}' for j in range(np.shape(X)[1])]
+        Xv = np.asarray(X, dtype=np.float64)
+        self._norm_mean = pd.Series(Xv.mean(0), index=columns)
+        sd = Xv.std(0, ddof=1) if len(Xv) > 1 else np.ones(Xv.shape[1])
+        self._norm_std = pd.Series(np.where(sd > 0, sd, 1.0), index=columns)
+        s = self._prepare(Xv, t, e, strata, weights)
+
+        if isinstance(init, FastCoxPH) or hasattr(init, 'params_'):
+            init = init.params_.reindex(columns).fillna(0.0).to_numpy()
+        beta = np.zeros(len(columns)) if init is None else np.asarray(init, dtype=np.float64) * self._norm_std.values
+        ll, grad, H = self._derivatives(s, beta)
+        self.n_iter_ = 0
+        for self.n_iter_ in range(1, self.max_iter + 1):
+            step = np.linalg.solve(-H, grad)
+            # halve the step until the partial likelihood does not decrease
+            for _ in range(30):
+                new_ll, new_grad, new_H = self._derivatives(s, beta + step)
+                if np.isfinite(new_ll) and new_ll >= ll - 1e-12 * abs(ll):
+                    break
+                step = step / 2
+            beta = beta + step
+            done = np.max(np.abs(step)) < self.tol or abs(new_ll - ll) <= self.tol * abs(ll)
+            ll, grad, H = new_ll, new_grad, new_H
+            if done:
+                break
+
+        std = self._norm_std.values
+        self.params_ = pd.Series(beta / std, index=columns, name='coef')
+        self.params_.index.name = 'covariate'
+        self.variance_matrix_ = pd.DataFrame(np.linalg.inv(-H) / np.outer(std, std), index=columns, columns=columns)
+        self.standard_errors_ = pd.Series(np.sqrt(np.diag(self.variance_matrix_)), index=columns, name='se(coef)')
+        self.log_likelihood_ = float(ll)
+        inv = np.empty_like(s['order'])
+        inv[s['order']] = np.arange(len(inv))
+        self._train = (np.asarray(t, dtype=np.float64), np.asarray(e, dtype=np.float64),
+                       (beta @ s['ZT'])[inv])
+        self._concordance = None
+        return self
+
+    # --- results ---------------------------------------------------------------------
+
+    @property
+    def summary(self) -> pd.DataFrame:
+        z = stats.norm.ppf(1 - self.alpha / 2)
+        coef, se = self.params_, self.standard_errors_
+        pct = round(100 * (1 - self.alpha))
+        out = pd.DataFrame({'coef': coef, 'exp(coef)': np.exp(coef), 'se(coef)': se,
+                            f'coef lower {pct}%': coef - z * se, f'coef upper {pct}%': coef + z * se,
+                            f'exp(coef) lower {pct}%': np.exp(coef - z * se),
+                            f'exp(coef) upper {pct}%': np.exp(coef + z * se),
+                            'z': coef / se, 'p': 2 * stats.norm.sf(np.abs(coef / se))})
+        out.index.name = 'covariate'
+        return out
+
+    @property
+    def concordance_index_(self) -> float:
+        if self._concordance is None:
+            t, e, eta = self._train
+            self._concordance = harrell_c(t, e, eta)
+        return self._concordance
+
+    def predict_log_partial_hazard(self, X) -> pd.Series:
+        """(x - training mean) . beta, as lifelines; X: DataFrame with the fitted columns or array."""
+        index = X.index if isinstance(X, pd.DataFrame) else None
+        Xv = X[self.params_.index].to_numpy(np.float64) if isinstance(X, pd.DataFrame) else np.asarray(X, np.float64)
+        return pd.Series((Xv - self._norm_mean.values) @ self.params_.values, index=index)
+
+    def ph_test(self, X, t: Sequence, e: Sequence, strata: Sequence | None = None,
+                weights: Sequence | None = None) -> pd.DataFrame:
+        """Proportional-hazards test per covariate on the training data: scaled Schoenfeld
+        residuals against event rank, as lifelines' proportional_hazard_test(time_transform='rank')."""
+        s = self._prepare(X, t, e, strata, weights)
+        beta = self.params_.values * self._norm_std.values
+        _, _, D, U = self._risk_terms(s, beta)
+        # per-group Efron mean of the covariates over the tied deaths, then death residuals
+        m = np.bincount(s['rep'])
+        mean_g = np.add.reduceat(U / D, np.r_[0, np.cumsum(m)[:-1]], axis=1) / m
+        grp = np.full(s['G'], -1)
+        grp[s['ev']] = np.arange(len(s['ev']))
+        dead = np.flatnonzero(s['e'] > 0)
+        resid = (s['ZT'][:, dead] - mean_g[:, grp[s['gid'][dead]]]).T * self._norm_std.values
+        n_deaths = float(np.sum(s['e']))
+        scaled = n_deaths * resid @ self.variance_matrix_.values
+        # event rank in (stratum, time, event) order, the 'rank' time transform
+        ee, tt = np.asarray(e, dtype=np.float64), np.asarray(t, dtype=np.float64)
+        keys = (ee, tt) if strata is None else (ee, tt, pd.factorize(np.asarray(strata), sort=True)[0])
+        asc = np.lexsort(keys)
+        rank = np.empty(len(tt))
+        rank[asc] = np.cumsum(ee[asc])
+        g = rank[s['order']][dead]
+        g = g - g.mean()
+        T = (g @ scaled) ** 2 / (n_deaths * self.standard_errors_.values ** 2 * (g @ g))
+        return pd.DataFrame({'term': self.params_.index, 'test_statistic': T, 'p': stats.chi2.sf(T, 1)})
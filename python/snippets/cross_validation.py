@@ -0,0 +1,103 @@
+# cross_validation.py — repeated k-fold evaluation of the logistic and Cox models
+from __future__ import annotations
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score, brier_score_loss
+from sklearn.model_selection import RepeatedStratifiedKFold
+
+from .imputation import fit_imputer
+from .logistic_regression import fit_logistic, predict_proba
+from .survival_analysis import cox_fit, cox_predict
+from .survival_metrics import harrell_c
+
+__all__ = ["cv_splits", "cross_validate", "summarize_folds"]
+
+# Frame and model settings shared with fold workers once, through the pool initializer
+_CV: dict = {}
+
+def cv_splits(y: Sequence, k: int = 5, repeats: int = 1, seed: int = 123):
+    """[(repeat, fold, train_idx, test_idx)], stratified on y, reproducible for a given seed."""
+    rskf = RepeatedStratifiedKFold(n_splits=k, n_repeats=repeats, random_state=seed)
+    return [(i // k, i % k, tr, te) for i, (tr, te) in enumerate(rskf.split(np.zeros(len(y)), np.asarray(y)))]
+
+def _init_worker(shared: dict):
+    global _CV
+    _CV = shared
+
+def _safe(metric, *a):
+    try:
+        return float(metric(*a))
+    except (ValueError, ZeroDivisionError):  # a fold with one class / no comparable pairs
+        return float('nan')
+
+def _run_fold(split) -> tuple[dict, pd.DataFrame]:
+    """Fit imputation and both models on the training rows; score the held-out rows."""
+    rep, fold, tr, te = split
+    s = _CV
+    df, covars = s['df'], s['covars']
+    imp = fit_imputer(df.iloc[tr], covars, s['method'], s['iterative_max_iter'],
+                      random_state=s['seed'] + 1000 * rep + fold)
+    train = imp.transform(df.iloc[tr])
+    test = imp.transform(df.iloc[te])
+
+    y = test[s['outcome']].astype(int).to_numpy()
+    p = predict_proba(fit_logistic(train, s['outcome'], covars, cluster=s.get('cluster'), **s['logistic']), test)
+    rec = {'repeat': rep, 'fold': fold, 'n_train': len(tr), 'n_test': len(te),
+           'auc': _safe(roc_auc_score, y, p), 'brier': _safe(brier_score_loss, y, p)}
+
+    t, e = s['time'], s['status']
+    risk = np.full(len(test), np.nan)
+    if t and e:
+        cols = [t, e] + covars
+        cph = cox_fit(train, t, e, covars, **s['cox'])
+        ok = test[cols].notna().all(axis=1).to_numpy()
+        risk[ok] = cox_predict(cph, test.loc[ok, cols])
+        rec['c_index'] = harrell_c(test[t].to_numpy()[ok], test[e].to_numpy()[ok], risk[ok]) if ok.any() else np.nan
+    oof = pd.DataFrame({'row': te, 'repeat': rep, 'fold': fold, 'y_true': y, 'y_prob': p, 'risk': risk})
+    return rec, oof
+
+def cross_validate(df: pd.DataFrame, outcome: str, covars: list[str], time: str | None = None,
+                   status: str | None = None, imputation: dict | None = None, k: int = 5,
+                   repeats: int = 1, seed: int = 123, workers: int | None = None,
+                   cluster: str | None = None, cox: dict | None = None, logistic: dict | None = None) -> dict:
+    """Repeated stratified k-fold CV with imputation refitted inside each fold.
+
+    df is the frame *before* imputation. Folds run in a process pool (workers=1: in-process);
+    the frame is sent to each worker once, and fold seeds depend only on (seed, repeat, fold),
+    so results do not depend on workers. cox: extra cox_fit options (engine, ties, strata,
+    weights_col); logistic: extra fit_logistic options (sparse_design, max_levels, absorb).
+    Returns {'folds': per-fold metrics, 'oof': out-of-fold predictions (one row per held-out
+    row per repeat: row, repeat, fold, y_true, y_prob, risk)}.
+    """
+    imputation = imputation or {}
+    df = df.reset_index(drop=True)
+    shared = {'df': df, 'outcome': outcome, 'covars': list(covars), 'time': time, 'status': status,
+              'cluster': cluster, 'cox': dict(cox or {}), 'logistic': dict(logistic or {}), 'seed': int(seed),
+              'method': imputation.get('method', 'none'),
+              'iterative_max_iter': int(imputation.get('iterative_max_iter', 10))}
+    splits = cv_splits(df[outcome].astype(int), k, repeats, seed)
+    if workers == 1:
+        _init_worker(shared)
+        results = [_run_fold(sp) for sp in splits]
+    else:
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(shared,)) as pool:
+            results = list(pool.map(_run_fold, splits))
+    folds = pd.DataFrame([r for r, _ in results])
+    oof = pd.concat([o for _, o in results], ignore_index=True).sort_values(['repeat', 'row'], ignore_index=True)
+    return {'folds': folds, 'oof': oof}
+
+def summarize_folds(folds: pd.DataFrame) -> pd.DataFrame:
+    """cv_<metric> rows: mean over folds, with the 2.5–97.5% range of fold values."""
+    rows = []
+    for m in ('auc', 'brier', 'c_index'):
+        if m in folds:
+            v = folds[m].dropna()
+            rows.append({'metric': f'cv_{m}', 'estimate': v.mean(), 'ci_lower': v.quantile(0.025),
+                         'ci_upper': v.quantile(0.975), 'n_boot': 0})
+    return pd.DataFrame(rows)
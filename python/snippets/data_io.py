@@ -1,36 +1,194 @@
 # data_io.py — robust I/O and cleaning helpers
 from __future__ import annotations
+from pathlib import Path
+from typing import Iterator, Sequence
 import pandas as pd
 import numpy as np
 import re
 
-__all__ = ["read_clean", "clean_columns", "set_categorical_ref"]
+__all__ = ["read_clean", "read_clean_chunked", "clean_columns", "set_categorical_ref"]
 
-def clean_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Lowercase, snake_case, strip spaces/punctuation, collapse repeats."""
-    def _clean(col: str) -> str:
-        s = col.strip().lower()
-        s = re.sub(r"[^0-9a-zA-Z]+", "_", s)
-        s = re.sub(r"_+", "_", s).strip("_")
-        return s
-    df = df.copy()
+_TEXT_EXT = (".csv", ".tsv", ".txt")
+_PARQUET_EXT = (".parquet", ".pq")
+_FEATHER_EXT = (".feather", ".arrow", ".ipc")
+
+def _clean(col: str) -> str:
+    s = col.strip().lower()
+    s = re.sub(r"[^0-9a-zA-Z]+", "_", s)
+    s = re.sub(r"_+", "_", s).strip("_")
+    return s
+
+def clean_columns(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """Lowercase, snake_case, strip spaces/punctuation, collapse repeats.
+
+    inplace=True renames df's columns without copying the data and returns df.
+    """
+    if not inplace:
+        df = df.copy()
     df.columns = [_clean(c) for c in df.columns]
     return df
 
-def read_clean(path: str, sheet: int | str | None = None) -> pd.DataFrame:
-    """Read CSV/TSV/Excel and standardize columns."""
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except Exception:
+        raise ImportError("pyarrow is required for Parquet/Feather/pyarrow CSV. Install with: pip install pyarrow")
+
+def _raw_columns(raw_names: Sequence[str], columns: Sequence[str] | None) -> list[str] | None:
+    """Raw file column names whose cleaned form is in columns (None = all)."""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return [c for c in raw_names if _clean(c) in wanted]
+
+def _sidecar_path(path: str) -> Path:
+    p = Path(path)
+    return p.with_name(p.name + ".parquet")
+
+def read_clean(path: str, sheet: int | str | None = None, columns: Sequence[str] | None = None,
+               dtypes: dict | None = None, csv_engine: str | None = None,
+               strings_as_category: bool = False, parquet_cache: bool = False) -> pd.DataFrame:
+    """Read CSV/TSV/Excel/Parquet/Feather (Arrow IPC) and standardize columns.
+
+    columns: cleaned names to keep; pushed down into the reader (usecols / Parquet columns).
+    dtypes: {cleaned name: dtype} applied after reading, e.g. {'sex': 'category', 'age': 'float32'}.
+    csv_engine: pandas read_csv engine, e.g. 'pyarrow' (multithreaded parser).
+    strings_as_category: store remaining string columns as pandas categoricals.
+    parquet_cache: for CSV/TSV, read through a '<file>.parquet' sidecar written on first read
+    and refreshed whenever the text file is newer.
+    """
     low = path.lower()
-    if low.endswith((".csv", ".tsv", ".txt")):
+    if parquet_cache and low.endswith(_TEXT_EXT):
+        _require_pyarrow()
+        side = _sidecar_path(path)
+        if not side.exists() or side.stat().st_mtime < Path(path).stat().st_mtime:
+            read_clean(path, csv_engine=csv_engine).to_parquet(side, index=False)
+        path, low = str(side), str(side).lower()
+
+    if low.endswith(_TEXT_EXT):
         sep = "," if low.endswith(".csv") else "\t"
-        df = pd.read_csv(path, sep=sep)
+        if csv_engine == "pyarrow":
+            _require_pyarrow()
+        usecols = _raw_columns(pd.read_csv(path, sep=sep, nrows=0).columns, columns)
+        kw = {"engine": csv_engine} if csv_engine else {}
+        df = pd.read_csv(path, sep=sep, usecols=usecols, **kw)
     elif low.endswith(".xlsx"):
         df = pd.read_excel(path, sheet_name=sheet)
+        keep = _raw_columns(df.columns, columns)
+        if keep is not None:
+            df = df[keep]
+    elif low.endswith(_PARQUET_EXT):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        df = pd.read_parquet(path, columns=_raw_columns(pq.read_schema(path).names, columns))
+    elif low.endswith(_FEATHER_EXT):
+        _require_pyarrow()
+        import pyarrow.ipc as ipc
+        with ipc.open_file(path) as reader:
+            names = reader.schema.names
+        df = pd.read_feather(path, columns=_raw_columns(names, columns))
     else:
         raise ValueError(f"Unsupported file extension: {path}")
-    return clean_columns(df)
+    df = clean_columns(df, inplace=True)
+
+    for col, dtype in (dtypes or {}).items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    if strings_as_category:
+        for col in df.select_dtypes(include=["object", "string"]).columns:
+            df[col] = df[col].astype("category")
+    return df
+
+def _raw_chunks(path: str, columns: Sequence[str] | None, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yield raw chunks of a CSV/TSV/Parquet/Feather file, projected to the cleaned column names."""
+    low = path.lower()
+    if low.endswith(_TEXT_EXT):
+        sep = "," if low.endswith(".csv") else "\t"
+        usecols = _raw_columns(pd.read_csv(path, sep=sep, nrows=0).columns, columns)
+        with pd.read_csv(path, sep=sep, usecols=usecols, chunksize=chunksize) as reader:
+            yield from reader
+    elif low.endswith(_PARQUET_EXT):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=_raw_columns(pf.schema_arrow.names, columns)):
+            yield batch.to_pandas()
+    elif low.endswith(_FEATHER_EXT):
+        _require_pyarrow()
+        import pyarrow.ipc as ipc
+        with ipc.open_file(path) as reader:
+            keep = _raw_columns(reader.schema.names, columns)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                yield (batch.select(keep) if keep is not None else batch).to_pandas()
+    else:
+        raise ValueError(f"Chunked reading supports CSV/TSV/Parquet/Feather, not: {path}")
+
+def read_clean_chunked(path: str, columns: Sequence[str] | None = None, required: Sequence[str] = (),
+                       chunksize: int = 100_000, dtypes: dict | None = None,
+                       categories: dict[str, Sequence] | None = None, strings_as_category: bool = True,
+                       downcast: bool = True) -> pd.DataFrame:
+    """Stream a file in chunks and build the cleaned analysis frame one chunk at a time.
+
+    Peak memory is one raw chunk plus the (projected, filtered, downcast) result, instead of
+    the whole file plus several copies. Per chunk: keep only `columns` (cleaned names), drop
+    rows missing any `required` column, apply `dtypes`, downcast numerics (float64 → float32,
+    ints to the smallest integer type) and store strings as categoricals.
+
+    categories: fixed {column: categories}; values outside the set become NaN. Other string
+    columns get a category set that grows as chunks arrive (new values are appended, so codes
+    already assigned stay valid) and is sorted once at the end, so the result does not depend
+    on the chunk size.
+    """
+    dtypes = dict(dtypes or {})
+    fixed = {c: pd.CategoricalDtype(list(v)) for c, v in (categories or {}).items()}
+    for col, dtype in list(dtypes.items()):
+        if str(dtype) == "category":
+            dtypes.pop(col)
+            fixed.setdefault(col, None)
+    seen: dict[str, list] = {}
+    chunks = []
+    for chunk in _raw_chunks(path, columns, chunksize):
+        clean_columns(chunk, inplace=True)
+        if required:
+            chunk = chunk.dropna(subset=[c for c in required if c in chunk.columns])
+        for col in chunk.columns:
+            s = chunk[col]
+            if col in dtypes:
+                chunk[col] = s.astype(dtypes[col])
+            elif fixed.get(col) is not None:
+                chunk[col] = s.astype(fixed[col])
+            elif col in fixed or col in seen or (
+                    strings_as_category and (s.dtype == object or pd.api.types.is_string_dtype(s.dtype))):
+                cats = seen.setdefault(col, [])
+                known = set(cats)
+                cats.extend(v for v in pd.unique(s.dropna()) if v not in known)
+                chunk[col] = pd.Categorical(s, categories=cats)
+            elif downcast and pd.api.types.is_float_dtype(s.dtype):
+                chunk[col] = pd.to_numeric(s, downcast="float")
+            elif downcast and pd.api.types.is_integer_dtype(s.dtype):
+                chunk[col] = pd.to_numeric(s, downcast="integer")
+        chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame(columns=list(columns or []))
+    for col, cats in seen.items():
+        # Earlier chunks hold a prefix of the final category list: widening them keeps codes
+        for chunk in chunks:
+            s = chunk[col]
+            chunk[col] = (s.cat.set_categories(cats) if isinstance(s.dtype, pd.CategoricalDtype)
+                          else pd.Categorical(s, categories=cats))
+    df = pd.concat(chunks, ignore_index=True)
+    chunks.clear()
+    for col, cats in seen.items():
+        df[col] = df[col].cat.reorder_categories(sorted(cats, key=str))
+    return df
+
+def set_categorical_ref(df: pd.DataFrame, col: str, ref: str, inplace: bool = False) -> pd.DataFrame:
+    """Make col categorical with ref as its first (reference) level.
 
-def set_categorical_ref(df: pd.DataFrame, col: str, ref: str) -> pd.DataFrame:
-    out = df.copy()
+    inplace=True replaces the column on df itself instead of on a copy and returns df.
+    """
+    out = df if inplace else df.copy()
     out[col] = pd.Categorical(out[col])
     cats = list(out[col].cat.categories)
     if ref in cats:
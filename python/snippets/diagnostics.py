@@ -1,5 +1,7 @@
 # diagnostics.py — logistic & Cox diagnostics
 from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -7,9 +9,12 @@ from sklearn.metrics import roc_curve, auc, brier_score_loss
 from sklearn.calibration import calibration_curve
 from lifelines.statistics import proportional_hazard_test
 
+from .survival_analysis import cox_ph_test
+from .survival_metrics import harrell_c
+
 __all__ = [
     "logistic_diagnostics", "save_roc_plot", "save_calibration_plot",
-    "cox_ph_test_table"
+    "cox_ph_test_table", "bootstrap_logistic", "bootstrap_concordance", "format_ci"
 ]
 
 def logistic_diagnostics(y_true: pd.Series, y_prob: pd.Series) -> dict:
@@ -46,7 +51,97 @@ def save_calibration_plot(y_true: pd.Series, y_prob: pd.Series, path: str, n_bin
     plt.close()
 
 def cox_ph_test_table(cph, df: pd.DataFrame, duration_col: str, event_col: str) -> pd.DataFrame:
-    # Lifelines PH test per covariate
+    # PH test per covariate; cox_fit models (either engine) encode df themselves
+    if hasattr(cph, 'design_info'):
+        return cox_ph_test(cph, df)
     results = proportional_hazard_test(cph, df, time_transform='rank')
     tbl = results.summary.reset_index().rename(columns={'index':'term'})
     return tbl[['term','test_statistic','p']]
+
+# --- Bootstrap CIs --------------------------------------------------------------------
+# A bootstrap resample is a vector of multinomial counts w over the n rows, so every
+# statistic below is written as a weighted sum over the original rows and evaluated for a
+# whole batch of resamples (W: n_resamples x n) with array ops; rows are sorted once.
+
+def _resample_counts(rng: np.random.Generator, n_rows: int, n: int) -> np.ndarray:
+    """(n_rows, n) float64 bootstrap counts from one batch of indices drawn at once."""
+    idx = rng.integers(0, n, size=(n_rows, n))
+    idx += (np.arange(n_rows) * n)[:, None]
+    return np.bincount(idx.ravel(), minlength=n_rows * n).reshape(n_rows, n).astype(np.float64)
+
+def _group_sums(W: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(W, starts, axis=1) if W.shape[1] else np.zeros((len(W), 0))
+
+def _batched_auc_brier(y: np.ndarray, p: np.ndarray, W: np.ndarray) -> np.ndarray:
+    """Weighted Mann–Whitney AUC and Brier score per row of W → (len(W), 2)."""
+    order = np.argsort(p, kind="stable")
+    ps, ys, Ws = p[order], y[order], W[:, order]
+    starts = np.flatnonzero(np.r_[True, ps[1:] != ps[:-1]])  # tie groups of scores
+    P = _group_sums(Ws * ys, starts)                           # positive weight per group
+    N = _group_sums(Ws, starts) - P                            # negative weight per group
+    neg_below = np.cumsum(N, axis=1) - N                       # negatives with lower score
+    with np.errstate(invalid="ignore", divide="ignore"):
+        auc_b = (P * (neg_below + 0.5 * N)).sum(1) / (P.sum(1) * N.sum(1))
+    brier_b = W @ (y - p) ** 2 / W.sum(1)
+    return np.column_stack([auc_b, brier_b])
+
+def _batched_concordance(time: np.ndarray, event: np.ndarray, risk: np.ndarray, W: np.ndarray) -> np.ndarray:
+    """Weighted Harrell's C per row of W → (len(W), 1) (see survival_metrics.harrell_c)."""
+    return harrell_c(time, event, risk, weights=W.T)[:, None]
+
+def _bootstrap_block(stat, n: int, seed, n_rows: int) -> np.ndarray:
+    return stat(_resample_counts(np.random.default_rng(seed), n_rows, n))
+
+def _bootstrap(stat, n: int, n_boot: int, seed: int, batch: int | None, workers: int | None) -> np.ndarray:
+    """Evaluate stat on n_boot resamples in batches; each batch has its own child seed, so
+    the result is the same for any number of workers."""
+    if n_boot <= 0:
+        return np.empty((0, 0))
+    batch = batch or max(1, min(n_boot, 4_000_000 // max(n, 1)))
+    sizes = [min(batch, n_boot - i) for i in range(0, n_boot, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers == 1 or len(sizes) == 1:
+        parts = [_bootstrap_block(stat, n, sd, k) for sd, k in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(partial(_bootstrap_block, stat, n), seeds, sizes))
+    return np.vstack(parts)
+
+def _ci_table(names, point, boot, alpha):
+    if not boot.size:  # n_boot=0: point estimates only
+        boot = np.empty((0, len(names)))
+        lo = hi = np.full(len(names), np.nan)
+    else:
+        lo, hi = np.nanquantile(boot, [alpha / 2, 1 - alpha / 2], axis=0)
+    return pd.DataFrame({"metric": names, "estimate": point, "ci_lower": lo, "ci_upper": hi,
+                         "n_boot": np.isfinite(boot).sum(0)})
+
+def bootstrap_logistic(y_true, y_prob, n_boot: int = 1000, alpha: float = 0.05, seed: int = 123,
+                       batch: int | None = None, workers: int | None = 1) -> pd.DataFrame:
+    """Percentile bootstrap CIs for AUC and Brier score (columns metric, estimate, ci_lower,
+    ci_upper, n_boot). batch = resamples per vectorised block (default: ~4M counts);
+    workers > 1 (or None = all cores) spreads blocks over a process pool."""
+    y = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(y_prob, dtype=np.float64)
+    stat = partial(_batched_auc_brier, y, p)
+    point = stat(np.ones((1, len(y))))[0]
+    boot = _bootstrap(stat, len(y), n_boot, seed, batch, workers)
+    return _ci_table(["auc", "brier"], point, boot, alpha)
+
+def bootstrap_concordance(time, event, risk, n_boot: int = 1000, alpha: float = 0.05, seed: int = 123,
+                          batch: int | None = None, workers: int | None = 1) -> pd.DataFrame:
+    """Percentile bootstrap CI for Harrell's c-index of a risk score (higher = earlier event),
+    e.g. cph.predict_log_partial_hazard(df)."""
+    t = np.asarray(time, dtype=np.float64)
+    e = np.asarray(event).astype(bool)
+    r = np.asarray(risk, dtype=np.float64)
+    stat = partial(_batched_concordance, t, e, r)
+    point = stat(np.ones((1, len(t))))[0]
+    boot = _bootstrap(stat, len(t), n_boot, seed, batch, workers)
+    return _ci_table(["c_index"], point, boot, alpha)
+
+def format_ci(est: float, lo: float | None = None, hi: float | None = None, alpha: float = 0.05) -> str:
+    """'0.712' or '0.712 (95% CI 0.684–0.739)'."""
+    if lo is None or hi is None or not (np.isfinite(lo) and np.isfinite(hi)):
+        return f"{est:.3f}"
+    return f"{est:.3f} ({100 * (1 - alpha):g}% CI {lo:.3f}–{hi:.3f})"
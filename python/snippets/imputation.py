@@ -5,30 +5,87 @@ import numpy as np
 from sklearn.experimental import enable_iterative_imputer  # noqa: F401
 from sklearn.impute import SimpleImputer, IterativeImputer
 
-__all__ = ["impute_covariates"]
-
-def impute_covariates(df: pd.DataFrame, covars: list[str], method: str = 'none', iterative_max_iter: int = 10) -> pd.DataFrame:
-    method = (method or 'none').lower()
-    if method not in {'none','simple','iterative'}:
-        raise ValueError("imputation.method must be one of: none | simple | iterative")
-    if method == 'none':
-        return df
-    out = df.copy()
-    X = out[covars]
-    num_cols = X.select_dtypes(include=['number']).columns.tolist()
-    cat_cols = [c for c in covars if c not in num_cols]
-    if method == 'simple':
-        if num_cols:
-            sim_num = SimpleImputer(strategy='median')
-            out[num_cols] = sim_num.fit_transform(out[num_cols])
-        if cat_cols:
-            sim_cat = SimpleImputer(strategy='most_frequent')
-            out[cat_cols] = sim_cat.fit_transform(out[cat_cols])
-    else:
-        if num_cols:
-            iim = IterativeImputer(max_iter=int(iterative_max_iter), random_state=123)
-            out[num_cols] = iim.fit_transform(out[num_cols])
-        if cat_cols:
-            sim_cat = SimpleImputer(strategy='most_frequent')
-            out[cat_cols] = sim_cat.fit_transform(out[cat_cols])
-    return out
+__all__ = ["CovariateImputer", "fit_imputer", "impute_covariates"]
+
+_METHODS = {'none', 'simple', 'iterative'}
+
+class CovariateImputer:
+    """Covariate imputation fitted on one frame and applicable to others (picklable).
+
+    Numeric covariates: median (simple) or IterativeImputer (iterative); categorical
+    covariates: most frequent value. Fit on training rows only and transform held-out rows
+    to keep test information out of the imputation model.
+
+    sample_posterior=True (for multiple imputation) draws instead of plugging in a single
+    value: IterativeImputer samples from its posterior, simple draws observed numeric values,
+    and categoricals are drawn from the observed level frequencies, seeded by random_state.
+    """
+
+    def __init__(self, covars: list[str], method: str = 'none', iterative_max_iter: int = 10,
+                 random_state: int = 123, sample_posterior: bool = False):
+        method = (method or 'none').lower()
+        if method not in _METHODS:
+            raise ValueError("imputation.method must be one of: none | simple | iterative")
+        self.covars = list(covars)
+        self.method = method
+        self.iterative_max_iter = int(iterative_max_iter)
+        self.random_state = random_state
+        self.sample_posterior = sample_posterior
+        self.num_cols: list[str] = []
+        self.cat_cols: list[str] = []
+        self._num = self._cat = None
+        self._observed: dict[str, tuple[np.ndarray, np.ndarray]] = {}  # column -> (values, probs)
+
+    def fit(self, df: pd.DataFrame) -> "CovariateImputer":
+        if self.method == 'none':
+            return self
+        X = df[self.covars]
+        self.num_cols = X.select_dtypes(include=['number']).columns.tolist()
+        self.cat_cols = [c for c in self.covars if c not in self.num_cols]
+        draw_cols = list(self.cat_cols)
+        if self.num_cols:
+            if self.method == 'iterative':
+                self._num = IterativeImputer(max_iter=self.iterative_max_iter, random_state=self.random_state,
+                                             sample_posterior=self.sample_posterior).fit(df[self.num_cols])
+            elif self.sample_posterior:
+                draw_cols += self.num_cols
+            else:
+                self._num = SimpleImputer(strategy='median').fit(df[self.num_cols])
+        if self.sample_posterior:
+            for c in draw_cols:
+                vals, counts = np.unique(df[c].dropna().to_numpy(), return_counts=True)
+                self._observed[c] = (vals, counts / counts.sum())
+        elif self.cat_cols:
+            self._cat = SimpleImputer(strategy='most_frequent').fit(df[self.cat_cols])
+        return self
+
+    def transform(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        """Impute df's covariates; inplace=True fills df itself instead of a copy."""
+        if self.method == 'none':
+            return df
+        out = df if inplace else df.copy()
+        if self._num is not None:
+            out[self.num_cols] = self._num.transform(out[self.num_cols])
+        if self._cat is not None:
+            out[self.cat_cols] = self._cat.transform(out[self.cat_cols])
+        if self._observed:
+            rng = np.random.default_rng(self.random_state)
+            for c, (vals, probs) in self._observed.items():
+                miss = out[c].isna().to_numpy()
+                if miss.any() and len(vals):
+                    col = out[c].astype(object) if isinstance(out[c].dtype, pd.CategoricalDtype) else out[c].copy()
+                    col[miss] = rng.choice(vals, size=int(miss.sum()), p=probs)
+                    out[c] = col.astype(out[c].dtype)
+        return out
+
+def fit_imputer(df: pd.DataFrame, covars: list[str], method: str = 'none', iterative_max_iter: int = 10,
+                random_state: int = 123, sample_posterior: bool = False) -> CovariateImputer:
+    return CovariateImputer(covars, method, iterative_max_iter, random_state, sample_posterior).fit(df)
+
+def impute_covariates(df: pd.DataFrame, covars: list[str], method: str = 'none', iterative_max_iter: int = 10,
+                      inplace: bool = False) -> pd.DataFrame:
+    """Impute covariates (numeric: median / iterative, categorical: most frequent).
+
+    inplace=True fills the columns of df itself instead of a copy and returns df.
+    """
+    return fit_imputer(df, covars, method, iterative_max_iter).transform(df, inplace=inplace)
@@ -3,22 +3,299 @@ from __future__ import annotations
 import pandas as pd
 import numpy as np
 import statsmodels.api as sm
-from typing import Sequence, Optional
+from scipy import sparse, stats
+from scipy.sparse.linalg import splu
+from scipy.special import expit
+from typing import Iterable, Iterator, Optional, Sequence
 
-__all__ = ["fit_logistic", "or_table", "predict_proba"]
+__all__ = ["DesignSpec", "SparseLogitResults", "fit_logistic", "fit_design", "fit_sparse_design",
+           "logistic_design", "or_table", "predict_proba", "iter_predict_proba"]
 
-def fit_logistic(df: pd.DataFrame, outcome: str, covariates: Sequence[str], cluster: Optional[str] = None):
-    X = df[list(covariates)].copy()
-    X = pd.get_dummies(X, drop_first=True)  # handle categoricals
-    X = sm.add_constant(X)
-    y = df[outcome]
+def _is_categorical(s: pd.Series) -> bool:
+    return (isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object
+            or pd.api.types.is_string_dtype(s.dtype))
 
-    model = sm.GLM(y, X, family=sm.families.Binomial())
-    if cluster and cluster in df.columns:
-        res = model.fit(cov_type="cluster", cov_kwds={"groups": df[cluster]})
+class DesignSpec:
+    """Covariate encoding frozen at fit time (picklable).
+
+    Numeric/bool covariates pass through; categoricals become k-1 indicators for the levels
+    seen at fit time (first level = reference, as with get_dummies(drop_first=True)); unseen
+    levels and missing values encode as the reference. Column names and order match the
+    get_dummies + add_constant design the fits used before.
+    """
+
+    def __init__(self, covariates: Sequence[str], levels: dict[str, list], add_const: bool = True):
+        self.covariates = list(covariates)
+        self.levels = {c: list(v) for c, v in levels.items()}
+        self.add_const = add_const
+        numeric = [c for c in self.covariates if c not in self.levels]
+        dummies = [f"{c}_{lvl}" for c in self.covariates if c in self.levels for lvl in self.levels[c][1:]]
+        self.columns = (["const"] if add_const else []) + numeric + dummies
+        # column offset of each numeric covariate / first indicator of each categorical
+        off = int(add_const)
+        self._slots: dict[str, int] = {}
+        for c in numeric:
+            self._slots[c] = off
+            off += 1
+        for c in self.covariates:
+            if c in self.levels:
+                self._slots[c] = off
+                off += len(self.levels[c]) - 1
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, covariates: Sequence[str], add_const: bool = True) -> "DesignSpec":
+        levels = {}
+        for c in covariates:
+            s = df[c]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                levels[c] = list(s.cat.categories)
+            elif _is_categorical(s):
+                levels[c] = sorted(s.dropna().unique())
+        return cls(covariates, levels, add_const)
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Encode df into a C-contiguous float64 matrix with columns self.columns."""
+        n = len(df)
+        X = np.zeros((n, len(self.columns)), dtype=np.float64)
+        if self.add_const:
+            X[:, 0] = 1.0
+        rows = np.arange(n)
+        for c in self.covariates:
+            j = self._slots[c]
+            if c in self.levels:
+                s = df[c]
+                if isinstance(s.dtype, pd.CategoricalDtype) and list(s.cat.categories) == self.levels[c]:
+                    codes = s.cat.codes.to_numpy()  # already coded against the fit's levels
+                else:
+                    codes = pd.Categorical(s, categories=self.levels[c]).codes
+                hit = codes > 0
+                X[rows[hit], j + codes[hit].astype(np.int64) - 1] = 1.0  # int8 codes overflow past 127
+            else:
+                X[:, j] = df[c].to_numpy(dtype=np.float64, na_value=np.nan)
+        return X
+
+    def transform_sparse(self, df: pd.DataFrame) -> sparse.csr_matrix:
+        """transform() as a CSR matrix: one stored value per numeric column and one per
+        categorical, however many levels it has."""
+        n = len(df)
+        rows, cols, vals = [], [], []
+        if self.add_const:
+            rows.append(np.arange(n))
+            cols.append(np.zeros(n, dtype=np.int64))
+            vals.append(np.ones(n))
+        for c in self.covariates:
+            j = self._slots[c]
+            if c in self.levels:
+                codes = pd.Categorical(df[c], categories=self.levels[c]).codes
+                hit = np.flatnonzero(codes > 0)
+                rows.append(hit)
+                cols.append(j + codes[hit].astype(np.int64) - 1)
+                vals.append(np.ones(len(hit)))
+            else:
+                rows.append(np.arange(n))
+                cols.append(np.full(n, j, dtype=np.int64))
+                vals.append(df[c].to_numpy(dtype=np.float64, na_value=np.nan))
+        return sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                 shape=(n, len(self.columns)))
+
+    def frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """transform() as a DataFrame (named columns, df's index) for fitting."""
+        return pd.DataFrame(self.transform(df), columns=self.columns, index=df.index)
+
+def fit_design(X: np.ndarray, y, columns: Sequence[str], groups=None):
+    """Binomial GLM on an already encoded design matrix (cluster-robust SEs if groups given)."""
+    model = sm.GLM(np.asarray(y, dtype=np.float64), pd.DataFrame(X, columns=list(columns)),
+                   family=sm.families.Binomial())
+    if groups is not None:
+        return model.fit(cov_type="cluster", cov_kwds={"groups": np.asarray(groups)})
+    return model.fit()
+
+class SparseLogitResults:
+    """Result of fit_sparse_design with the GLMResults attributes the pipeline reads
+    (params, bse, pvalues, conf_int(), llf, predict()). Absorbed fixed effects are kept
+    apart in fe_params/fe_bse so tables report only the covariates."""
+
+    def __init__(self, params: pd.Series, bse: pd.Series, fe_params: pd.Series, fe_bse: pd.Series,
+                 llf: float, mu: np.ndarray, n_iter: int, converged: bool, cov_type: str):
+        self.params, self.bse = params, bse
+        self.fe_params, self.fe_bse = fe_params, fe_bse
+        self.llf = llf
+        self.nobs = len(mu)
+        self.n_iter, self.converged = n_iter, converged
+        self.cov_type = cov_type
+        self._mu = mu
+
+    @property
+    def pvalues(self) -> pd.Series:
+        return pd.Series(2 * stats.norm.sf(np.abs(self.params / self.bse)), index=self.params.index)
+
+    def conf_int(self, alpha: float = 0.05) -> pd.DataFrame:
+        z = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame({0: self.params - z * self.bse, 1: self.params + z * self.bse})
+
+    def predict(self) -> np.ndarray:
+        """Fitted probabilities of the training rows."""
+        return self._mu
+
+def _factor(D: sparse.spmatrix):
+    """Solver for the sparse-block Hessian: elementwise when it is diagonal (one
+    categorical), sparse LU otherwise."""
+    d = D.diagonal()
+    if D.nnz == np.count_nonzero(d):
+        return lambda b: b / (d[:, None] if np.ndim(b) == 2 else d)
+    lu = splu(sparse.csc_matrix(D))
+    return lambda b: lu.solve(np.asarray(b, dtype=np.float64))
+
+def _diag_inv(D: sparse.spmatrix, solve, block: int = 256) -> np.ndarray:
+    """diag(D^-1), solving against identity columns a block at a time."""
+    k = D.shape[0]
+    if D.nnz == np.count_nonzero(D.diagonal()):
+        return 1.0 / D.diagonal()
+    out = np.empty(k)
+    for lo in range(0, k, block):
+        idx = np.arange(lo, min(lo + block, k))
+        E = np.zeros((k, len(idx)))
+        E[idx, np.arange(len(idx))] = 1.0
+        out[idx] = solve(E)[idx, np.arange(len(idx))]
+    return out
+
+def fit_sparse_design(X: sparse.spmatrix, y, columns: Sequence[str], n_dense: int, groups=None,
+                      n_absorbed: int = 0, tol: float = 1e-10, max_iter: int = 100) -> SparseLogitResults:
+    """Logistic regression by Newton-Raphson on a sparse design.
+
+    The first n_dense columns (intercept, numeric covariates, low-cardinality dummies) form a
+    dense block; the rest are indicator columns of high-cardinality categoricals. Each Newton
+    step eliminates the indicator block through its Schur complement (it is diagonal for one
+    categorical), so memory is O(nnz + k * n_dense) instead of a dense n x k matrix. The last
+    n_absorbed columns are fixed effects (e.g. facility): fitted, reported in fe_params, and
+    left out of params. groups gives cluster-robust SEs with the statsmodels small-sample
+    correction.
+    """
+    columns = list(columns)
+    y = np.asarray(y, dtype=np.float64)
+    X = sparse.csc_matrix(X, dtype=np.float64)
+    n, k = X.shape
+    Xd = X[:, :n_dense].toarray()
+    S = X[:, n_dense:]
+    live = np.flatnonzero(S.getnnz(axis=0) > 0)    # levels without rows have no estimate
+    S = sparse.csr_matrix(S[:, live])
+
+    def loglik(bd, bs):
+        eta = Xd @ bd + S @ bs
+        return float(y @ eta - np.logaddexp(0.0, eta).sum()), eta
+
+    def derivatives(eta):
+        mu = expit(eta)
+        w = mu * (1 - mu)
+        r = y - mu
+        Xw = Xd * w[:, None]
+        A = Xw.T @ Xd
+        Bt = np.asarray(S.T @ Xw)                     # (sparse cols, dense cols)
+        D = (S.T @ S.multiply(w[:, None])).tocsr()
+        solve = _factor(D)
+        DinvBt = solve(Bt)
+        Cinv = np.linalg.pinv(A - Bt.T @ DinvBt)
+        return {'mu': mu, 'r': r, 'gd': Xd.T @ r, 'gs': S.T @ r, 'Bt': Bt, 'D': D, 'solve': solve,
+                'DinvBt': DinvBt, 'Cinv': Cinv}
+
+    bd, bs = np.zeros(n_dense), np.zeros(len(live))
+    if 'const' in columns[:n_dense]:
+        ybar = np.clip(y.mean(), 1e-6, 1 - 1e-6)
+        bd[columns.index('const')] = np.log(ybar / (1 - ybar))
+    ll, eta = loglik(bd, bs)
+    h = derivatives(eta)
+    converged, it = False, 0
+    for it in range(1, max_iter + 1):
+        Dinv_gs = h['solve'](h['gs'])
+        step_d = h['Cinv'] @ (h['gd'] - h['Bt'].T @ Dinv_gs)
+        step_s = Dinv_gs - h['DinvBt'] @ step_d
+        # halve the step until the log-likelihood does not decrease
+        for _ in range(30):
+            new_ll, new_eta = loglik(bd + step_d, bs + step_s)
+            if np.isfinite(new_ll) and new_ll >= ll - 1e-12 * abs(ll):
+                break
+            step_d, step_s = step_d / 2, step_s / 2
+        bd, bs = bd + step_d, bs + step_s
+        done = abs(new_ll - ll) <= tol * (abs(ll) + tol)
+        ll, eta = new_ll, new_eta
+        h = derivatives(eta)
+        if done:
+            converged = True
+            break
+
+    Cinv, DinvBt, solve = h['Cinv'], h['DinvBt'], h['solve']
+    if groups is None:
+        var_d = np.diag(Cinv)
+        var_s = _diag_inv(h['D'], solve) + np.einsum('ij,ij->i', DinvBt @ Cinv, DinvBt)
+        cov_type = 'nonrobust'
     else:
-        res = model.fit()
-    res.design_info = {"columns": X.columns.tolist()}
+        # sandwich H^-1 M H^-1 from per-cluster score sums, without forming H^-1
+        g_codes, g_levels = pd.factorize(np.asarray(groups))
+        G = len(g_levels)
+        Gm = sparse.csr_matrix((np.ones(n), (g_codes, np.arange(n))), shape=(G, n))
+        Ss = sparse.csr_matrix(Gm @ S.multiply(h['r'][:, None]))
+        Z = Gm @ (Xd * h['r'][:, None]) - Ss @ DinvBt
+        Hd = Z @ Cinv                                 # dense rows of H^-1 s_g
+        var_d = np.einsum('gi,gi->i', Hd, Hd)
+        var_s = np.zeros(len(live))
+        for lo in range(0, G, 256):
+            blk = slice(lo, lo + 256)
+            Hs = solve(Ss[blk].T.toarray()).T - Hd[blk] @ DinvBt.T
+            var_s += np.einsum('gi,gi->i', Hs, Hs)
+        c = G / (G - 1) * (n - 1) / (n - k) if G > 1 and n > k else 1.0
+        var_d, var_s = c * var_d, c * var_s
+        cov_type = 'cluster'
+
+    beta, var = np.zeros(k), np.full(k, np.nan)
+    beta[:n_dense], var[:n_dense] = bd, var_d
+    beta[n_dense + live], var[n_dense + live] = bs, var_s
+    se = np.sqrt(var)
+    m = k - n_absorbed
+    return SparseLogitResults(pd.Series(beta[:m], index=columns[:m]), pd.Series(se[:m], index=columns[:m]),
+                              pd.Series(beta[m:], index=columns[m:]), pd.Series(se[m:], index=columns[m:]),
+                              ll, h['mu'], it, converged, cov_type)
+
+def logistic_design(df: pd.DataFrame, covariates: Sequence[str], sparse_design: bool | str = 'auto',
+                    max_levels: int = 50, absorb: str | Sequence[str] | None = None):
+    """(spec, n_dense, n_absorbed) for fit_logistic's options.
+
+    n_dense is None when every column is dense (statsmodels GLM). Otherwise the spec orders
+    dense covariates first, then the sparse indicator blocks, then the absorbed fixed
+    effects (the last n_absorbed columns): the column order fit_sparse_design expects.
+    """
+    absorb = [absorb] if isinstance(absorb, str) else list(absorb or [])
+    covariates = [c for c in covariates if c not in absorb]
+    probe = DesignSpec.from_frame(df, covariates)
+    high = [c for c in covariates if c in probe.levels
+            and (sparse_design is True or (sparse_design == 'auto' and len(probe.levels[c]) > max_levels))]
+    if not high and not absorb:
+        return probe, None, 0
+    levels = dict(probe.levels)
+    levels.update({c: sorted(df[c].dropna().unique()) for c in absorb})
+    spec = DesignSpec([c for c in covariates if c not in high] + high + absorb, levels)
+    n_sparse = sum(len(levels[c]) - 1 for c in high + absorb)
+    return spec, len(spec.columns) - n_sparse, sum(len(levels[c]) - 1 for c in absorb)
+
+def fit_logistic(df: pd.DataFrame, outcome: str, covariates: Sequence[str], cluster: Optional[str] = None,
+                 sparse_design: bool | str = 'auto', max_levels: int = 50,
+                 absorb: str | Sequence[str] | None = None):
+    """Logistic regression of outcome on covariates (categoricals dummy-coded by DesignSpec).
+
+    sparse_design='auto' fits categoricals with more than max_levels levels (facility,
+    diagnosis code) as sparse indicator columns with fit_sparse_design; True does so for
+    every categorical, False always builds the dense statsmodels GLM. absorb: fixed-effect
+    variables (e.g. the cluster or facility) fitted the same way but left out of params, so
+    or_table reports the covariates only.
+    """
+    groups = df[cluster] if cluster and cluster in df.columns else None
+    spec, n_dense, n_absorbed = logistic_design(df, covariates, sparse_design, max_levels, absorb)
+    if n_dense is None:
+        res = fit_design(spec.transform(df), df[outcome], spec.columns, groups=groups)
+        res.design_info = {"columns": spec.columns, "spec": spec}
+        return res
+    res = fit_sparse_design(spec.transform_sparse(df), df[outcome], spec.columns, n_dense,
+                            groups=groups, n_absorbed=n_absorbed)
+    res.design_info = {"columns": spec.columns, "spec": spec, "sparse": True}
     return res
 
 def or_table(res) -> pd.DataFrame:
@@ -33,14 +310,30 @@ def or_table(res) -> pd.DataFrame:
     })
     return out[out["term"] != "const"].reset_index(drop=True)
 
-def predict_proba(res, df: pd.DataFrame, covariates: Sequence[str]) -> np.ndarray:
-    X = df[list(covariates)].copy()
-    X = pd.get_dummies(X, drop_first=True)
-    cols = res.design_info['columns']
-    for c in cols:
-        if c not in X.columns and c != 'const':
-            X[c] = 0
-    X = X.reindex(columns=[c for c in cols if c != 'const'], fill_value=0)
-    X = sm.add_constant(X, has_constant='add')
-    p = res.predict(X)
-    return np.asarray(p)
+def _scorer(res):
+    """(encode, beta, inverse link) for res; sparse fits score sparse rows with the
+    absorbed fixed effects appended to beta."""
+    spec = res.design_info["spec"]
+    if res.design_info.get("sparse"):
+        return spec.transform_sparse, np.r_[res.params.to_numpy(), res.fe_params.to_numpy()], expit
+    return spec.transform, np.asarray(res.params, dtype=np.float64), res.model.family.link.inverse
+
+def predict_proba(res, df: pd.DataFrame, covariates: Sequence[str] | None = None,
+                  chunksize: int = 100_000) -> np.ndarray:
+    """Predicted probabilities for new rows, encoded with the fit's DesignSpec.
+
+    Rows are scored chunksize at a time, so the design matrix never exceeds
+    chunksize x n_terms. covariates is accepted for backward compatibility; the spec
+    recorded at fit time decides which columns are used.
+    """
+    encode, beta, inverse = _scorer(res)
+    out = np.empty(len(df), dtype=np.float64)
+    for i in range(0, len(df), chunksize):
+        out[i:i + chunksize] = inverse(encode(df.iloc[i:i + chunksize]) @ beta)
+    return out
+
+def iter_predict_proba(res, frames: Iterable[pd.DataFrame]) -> Iterator[np.ndarray]:
+    """Score an iterable of DataFrames (e.g. a chunked reader), yielding one array per chunk."""
+    encode, beta, inverse = _scorer(res)
+    for chunk in frames:
+        yield inverse(encode(chunk) @ beta)
@@ -0,0 +1,82 @@
+# scheduler.py — tiny DAG scheduler: run independent pipeline stages in a process pool
+from __future__ import annotations
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Sequence
+
+__all__ = ["run_dag", "critical_path", "format_timings"]
+
+# stage spec: name -> (fn, deps, local); fn(*[results[d] for d in deps]) must be picklable
+# (module-level function or functools.partial of one) unless local=True (runs in the parent)
+StageSpec = tuple[Callable[..., Any], Sequence[str], bool]
+
+def run_dag(stages: dict[str, StageSpec], workers: int | None = None,
+            results: dict[str, Any] | None = None) -> tuple[dict[str, Any], dict[str, tuple[float, float]]]:
+    """Run stages as soon as their dependencies finish.
+
+    results may be pre-seeded (e.g. with cache hits) to satisfy dependencies. workers=1 runs
+    everything in-process, in dependency order. Returns (results, {name: (start_s, end_s)}).
+    """
+    results = dict(results or {})
+    timings: dict[str, tuple[float, float]] = {}
+    pending = dict(stages)
+    running: dict = {}
+    t0 = time.perf_counter()
+    pool = None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            ready = [n for n, (_, deps, _) in pending.items() if all(d in results for d in deps)]
+            # Submit everything the pool can take first, then run at most one in-process
+            # stage and re-check: a long local stage must not hold back ready pool stages
+            local_ready = []
+            for name in ready:
+                if pool is None or pending[name][2]:
+                    local_ready.append(name)
+                    continue
+                fn, deps, _ = pending.pop(name)
+                running[pool.submit(fn, *[results[d] for d in deps])] = (name, time.perf_counter() - t0)
+            if local_ready:
+                name = local_ready[0]
+                fn, deps, _ = pending.pop(name)
+                start = time.perf_counter() - t0
+                results[name] = fn(*[results[d] for d in deps])
+                timings[name] = (start, time.perf_counter() - t0)
+                for fut in [f for f in running if f.done()]:
+                    name, start = running.pop(fut)
+                    results[name] = fut.result()
+                    timings[name] = (start, time.perf_counter() - t0)
+                continue
+            if not running:
+                if pending:
+                    raise ValueError(f'Unsatisfiable dependencies for stages: {sorted(pending)}')
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, start = running.pop(fut)
+                results[name] = fut.result()
+                timings[name] = (start, time.perf_counter() - t0)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return results, timings
+
+def critical_path(stages: dict[str, StageSpec], timings: dict[str, tuple[float, float]]) -> tuple[float, list[str]]:
+    """Longest chain of stage durations through the dependency graph."""
+    best: dict[str, tuple[float, list[str]]] = {}
+    for name in sorted(timings, key=lambda n: timings[n][1]):
+        deps = stages[name][1] if name in stages else ()
+        prev = max((best[d] for d in deps if d in best), key=lambda b: b[0], default=(0.0, []))
+        dur = timings[name][1] - timings[name][0]
+        best[name] = (prev[0] + dur, prev[1] + [name])
+    return max(best.values(), key=lambda b: b[0], default=(0.0, []))
+
+def format_timings(stages: dict[str, StageSpec], timings: dict[str, tuple[float, float]]) -> str:
+    lines = [f"{'stage':<16} {'start':>7} {'end':>7} {'wall':>7}"]
+    for name, (start, end) in sorted(timings.items(), key=lambda kv: kv[1][0]):
+        lines.append(f'{name:<16} {start:7.2f} {end:7.2f} {end - start:7.2f}')
+    total = max((end for _, end in timings.values()), default=0.0)
+    serial = sum(end - start for start, end in timings.values())
+    cp_len, cp = critical_path(stages, timings)
+    lines.append(f"total wall {total:.2f}s | sum of stages {serial:.2f}s | "
+                 f"critical path {cp_len:.2f}s: {' → '.join(cp)}")
+    return '\n'.join(lines)
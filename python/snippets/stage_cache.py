@@ -0,0 +1,109 @@
+# stage_cache.py — content-addressed on-disk cache for pipeline stages
+from __future__ import annotations
+import csv
+import datetime as _dt
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Sequence
+
+__all__ = ["StageCache", "file_digest", "stage_key"]
+
+# Bump when stage code changes in a way that invalidates cached results
+CACHE_VERSION = 1
+
+def file_digest(path: str, block: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(block), b''):
+            h.update(buf)
+    return h.hexdigest()
+
+def stage_key(name: str, *parts: Any) -> str:
+    """Key of a stage = hash of its name, upstream keys/digests and config slice (JSON-able)."""
+    blob = json.dumps([CACHE_VERSION, name, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+class StageCache:
+    """Store stage results (pickled) and produced files under root/<stage>/<key>/.
+
+    run() returns the cached result on a hit (restoring any files to their target paths)
+    or calls compute() on a miss and stores what it returns. Results are also memoized in
+    memory so several downstream stages can share one upstream result within a run.
+    """
+
+    def __init__(self, root: str | Path, enabled: bool = True, force: Iterable[str] | bool = False):
+        self.root = Path(root)
+        self.enabled = enabled
+        self.force = force if isinstance(force, bool) else set(force)
+        self.log: list[dict] = []
+        self._memo: dict[tuple[str, str], Any] = {}
+
+    def _forced(self, name: str) -> bool:
+        return self.force is True or (isinstance(self.force, set) and name in self.force)
+
+    def options(self) -> tuple:
+        """Constructor arguments, to rebuild an equivalent cache in a worker process."""
+        return (self.root, self.enabled, self.force)
+
+    def has(self, name: str, key: str, files: Sequence[str] = ()) -> bool:
+        """True if run() would be a hit (entry present and stage not forced)."""
+        entry = self.root / name / key
+        return (self.enabled and not self._forced(name) and (entry / 'result.pkl').exists()
+                and all((entry / Path(f).name).exists() for f in files))
+
+    def run(self, name: str, key: str, compute: Callable[[], Any], files: Sequence[str] = ()) -> Any:
+        if (name, key) in self._memo:
+            return self._memo[(name, key)]
+        t0 = time.perf_counter()
+        entry = self.root / name / key
+        result_pkl = entry / 'result.pkl'
+        hit = self.has(name, key, files)
+        if hit:
+            with open(result_pkl, 'rb') as fh:
+                value = pickle.load(fh)
+            for f in files:
+                Path(f).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(entry / Path(f).name, f)
+        else:
+            value = compute()
+            if self.enabled:
+                # Write to a per-process temp dir, then rename: concurrent runs sharing the
+                # cache may store the same key, and the first complete entry wins
+                tmp = entry.with_name(f'{key}.{os.getpid()}.tmp')
+                shutil.rmtree(tmp, ignore_errors=True)
+                tmp.mkdir(parents=True)
+                with open(tmp / 'result.pkl', 'wb') as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                for f in files:
+                    shutil.copyfile(f, tmp / Path(f).name)
+                shutil.rmtree(entry, ignore_errors=True)
+                try:
+                    tmp.rename(entry)
+                except OSError:
+                    shutil.rmtree(tmp, ignore_errors=True)
+        status = 'hit' if hit else ('off' if not self.enabled else 'miss')
+        secs = time.perf_counter() - t0
+        self.log.append({'stage': name, 'status': status, 'key': key[:12], 'seconds': round(secs, 3)})
+        print(f'[cache] {name:<16} {status:<4} {key[:12]}  {secs:.2f}s')
+        self._memo[(name, key)] = value
+        return value
+
+    def write_log(self, path: str | Path | None = None) -> Path:
+        """Append this run's hit/miss records to a CSV log (default: <root>/cache_log.csv)."""
+        path = Path(path) if path else self.root / 'cache_log.csv'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new = not path.exists()
+        stamp = _dt.datetime.now().isoformat(timespec='seconds')
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            w = csv.DictWriter(f, fieldnames=['run', 'stage', 'status', 'key', 'seconds'])
+            if new:
+                w.writeheader()
+            for rec in self.log:
+                w.writerow({'run': stamp, **rec})
+        return path
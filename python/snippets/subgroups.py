@@ -0,0 +1,247 @@
+# subgroups.py — per-subgroup logistic/Cox fits on one shared design, with interaction tests
+from __future__ import annotations
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from lifelines import CoxPHFitter
+from scipy import sparse, stats
+
+from .coxph import FastCoxPH
+from .logistic_regression import DesignSpec, fit_design, fit_sparse_design, logistic_design
+
+__all__ = ["subgroup_analysis", "FOREST_COLUMNS"]
+
+FOREST_COLUMNS = ["model", "variable", "level", "term", "n", "events", "estimate",
+                  "ci_lower", "ci_upper", "p_value", "p_interaction", "note"]
+
+# Design matrices and outcomes shared with workers once, through the pool initializer
+_SG: dict = {}
+
+def _init_worker(shared: dict):
+    global _SG
+    _SG = shared
+
+def _varying(X: np.ndarray) -> np.ndarray:
+    """Columns that are not constant within a slice (constant ones make the fit singular)."""
+    return np.flatnonzero(np.ptp(X, axis=0) > 0) if len(X) else np.arange(X.shape[1])
+
+def _fit_logit(X, cols, y, groups=None, Xs=None, sparse_cols=()):
+    """Logistic fit on a dense design, plus the sparse indicator block Xs (sparse_cols) when
+    the logistic options call for one; indicator columns without rows in the slice are dropped."""
+    keep = np.r_[0, [j for j in _varying(X) if j != 0]].astype(int)  # always keep const
+    if Xs is None:
+        res = fit_design(X[:, keep], y, [cols[j] for j in keep], groups=groups)
+    else:
+        live = np.flatnonzero(Xs.getnnz(axis=0) > 0)
+        names = [sparse_cols[j] for j in live]
+        res = fit_sparse_design(sparse.hstack([sparse.csr_matrix(X[:, keep]), Xs[:, live]], format='csr'), y,
+                                [cols[j] for j in keep] + names, len(keep), groups=groups,
+                                n_absorbed=sum(c in _SG['absorbed'] for c in names))
+    conf = res.conf_int()
+    return (pd.DataFrame({'term': res.params.index, 'estimate': np.exp(res.params.values),
+                          'ci_lower': np.exp(conf[0].values), 'ci_upper': np.exp(conf[1].values),
+                          'p_value': res.pvalues.values}), float(res.llf))
+
+def _fit_cox(X, cols, t, e, rows=None):
+    """Cox fit on an encoded design with the shared engine, strata and weights (rows: their slice)."""
+    sg = _SG
+    keep = _varying(X)
+    d = pd.DataFrame(X[:, keep], columns=[cols[j] for j in keep])
+    strata, w = sg['strata'], sg['weights']
+    if rows is not None:
+        strata = strata[rows] if strata is not None else None
+        w = w[rows] if w is not None else None
+    if sg['engine'] == 'fast':
+        cph = FastCoxPH(sg['ties']).fit(d, t, e, strata=strata, weights=w)
+    else:
+        d['_T'], d['_E'] = t, e
+        if strata is not None:
+            d['_S'] = strata
+        if w is not None:
+            d['_W'] = w
+        cph = CoxPHFitter().fit(d, duration_col='_T', event_col='_E', strata=['_S'] if strata is not None else None,
+                                weights_col='_W' if w is not None else None)
+    s = cph.summary
+    return (pd.DataFrame({'term': s.index, 'estimate': s['exp(coef)'].values,
+                          'ci_lower': s['exp(coef) lower 95%'].values, 'ci_upper': s['exp(coef) upper 95%'].values,
+                          'p_value': s['p'].values}), float(cph.log_likelihood_))
+
+def _run_slice(task) -> pd.DataFrame:
+    """Fit one model on one subgroup level; report the exposure terms."""
+    model, var, level, idx = task
+    s = _SG
+    drop = set(s['var_cols'].get(var, ()))  # the subgroup variable is constant in its own slices
+    base = s['logit_cols'] if model == 'logistic' else s['cox_cols']
+    keep = [j for j, c in enumerate(base) if c not in drop]
+    cols = [base[j] for j in keep]
+    events = int((s['y'] if model == 'logistic' else s['e'])[idx].sum())
+    rows = pd.DataFrame({'term': s['terms']})
+    try:
+        if events < s['min_events']:
+            raise ValueError(f'{events} events < min_events')
+        if model == 'logistic':
+            g = s['groups'][idx] if s['groups'] is not None else None
+            Xs, sparse_cols = None, ()
+            if s['Xs'] is not None:
+                keep_s = [j for j, c in enumerate(s['sparse_cols']) if c not in drop]
+                Xs, sparse_cols = s['Xs'][idx][:, keep_s], [s['sparse_cols'][j] for j in keep_s]
+            tbl, _ = _fit_logit(s['X'][np.ix_(idx, keep)], cols, s['y'][idx], g, Xs, sparse_cols)
+        else:
+            tbl, _ = _fit_cox(s['Xc'][np.ix_(idx, keep)], cols, s['t'][idx], s['e'][idx], rows=idx)
+        rows = rows.merge(tbl, on='term', how='left')
+        rows['note'] = np.where(rows['estimate'].isna(), 'term constant in subgroup', '')
+    except Exception as exc:  # separation, too few events, singular design
+        rows['note'] = f'{type(exc).__name__}: {exc}'
+    rows.insert(0, 'model', model)
+    rows.insert(1, 'variable', var)
+    rows.insert(2, 'level', level)
+    rows['n'], rows['events'] = len(idx), events
+    return rows
+
+def _run_interaction(task) -> tuple[str, str, float]:
+    """Likelihood-ratio test of exposure x variable interaction terms on all rows."""
+    model, var = task
+    s = _SG
+    rows = s['var_rows'][var]  # rows with the variable observed
+    V, E = s['var_design'][var][rows], s['exposure_design'][rows]
+    inter = (E[:, :, None] * V[:, None, :]).reshape(len(E), -1)
+    try:
+        if model == 'logistic':
+            base, cols = s['X'][rows], list(s['logit_cols'])
+        else:
+            base, cols = s['Xc'][rows], list(s['cox_cols'])
+        # the variable's own columns are already in the model if it is a covariate (or, for the
+        # logistic model, an absorbed fixed effect); a Cox stratum needs none, as its main
+        # effect is constant within every stratum and cannot be estimated
+        if model == 'logistic':
+            implied = any(c in s['absorbed'] for c in s['var_cols'][var])
+        else:
+            implied = var in s['strata_cols']
+        extra = [] if var in s['covars'] or implied else [V]
+        Xr = np.hstack([base] + extra)
+        names = cols + [f'{var}__{k}' for k in range(sum(x.shape[1] for x in extra))]
+        Xf = np.hstack([Xr, inter])
+        names_f = names + [f'x__{k}' for k in range(inter.shape[1])]
+        if model == 'logistic':
+            g = s['groups']
+            g = g[rows] if g is not None else None
+            Xs = s['Xs'][rows] if s['Xs'] is not None else None
+            _, ll_r = _fit_logit(Xr, names, s['y'][rows], g, Xs, s['sparse_cols'])
+            _, ll_f = _fit_logit(Xf, names_f, s['y'][rows], g, Xs, s['sparse_cols'])
+        else:
+            t, e = s['t'][rows], s['e'][rows]
+            _, ll_r = _fit_cox(Xr, names, t, e, rows=rows)
+            _, ll_f = _fit_cox(Xf, names_f, t, e, rows=rows)
+        dof = np.linalg.matrix_rank(Xf) - np.linalg.matrix_rank(Xr)
+        p = float(stats.chi2.sf(2 * (ll_f - ll_r), dof)) if dof > 0 else float('nan')
+    except Exception:
+        p = float('nan')
+    return model, var, p
+
+def _dispatch(task):
+    kind, arg = task
+    return _run_slice(arg) if kind == 'slice' else _run_interaction(arg)
+
+def _indicator_design(col: pd.Series) -> np.ndarray:
+    """Treatment-coded dummies of a subgroup variable (reference level dropped)."""
+    col = col.astype('category')
+    return DesignSpec.from_frame(col.to_frame(), [col.name], add_const=False).transform(col.to_frame())
+
+def subgroup_analysis(df: pd.DataFrame, variables: Sequence[str], covars: Sequence[str],
+                      outcome: str | None = None, time: str | None = None, status: str | None = None,
+                      exposure: str | None = None, models: Sequence[str] = ('logistic', 'cox'),
+                      cluster: str | None = None, min_events: int = 5, workers: int | None = None,
+                      cox: dict | None = None, logistic: dict | None = None) -> pd.DataFrame:
+    """OR/HR of the exposure terms within every level of every subgroup variable.
+
+    The design matrices are encoded once for the whole frame; each subgroup level is a
+    precomputed row-index array into them, and slices are fitted in a process pool that
+    receives the matrices once. The subgroup variable's own columns are dropped within its
+    slices. p_interaction is a likelihood-ratio test of exposure x variable terms on all
+    rows; the exposure itself cannot be one of variables (ValueError). cox: cox_fit options
+    (engine, ties, strata, weights_col) used for every Cox fit; logistic: fit_logistic
+    options (sparse_design, max_levels, absorb) used for every logistic fit, so
+    high-cardinality categoricals stay a sparse block in every slice.
+    Returns one forest-plot-ready row per (model, variable, level, exposure term).
+    """
+    covars = list(covars)
+    exposure = exposure or covars[0]
+    if exposure not in covars:
+        raise ValueError(f'subgroups exposure {exposure!r} must be one of the covariates')
+    if exposure in variables:
+        # within its own levels the exposure is constant: every slice row would be empty
+        raise ValueError(f'subgroups exposure {exposure!r} cannot also be a subgroup variable; '
+                         'remove it from variables or set another exposure')
+    models = [m for m in models if (m == 'logistic' and outcome) or (m == 'cox' and time and status)]
+    cox = dict(cox or {})
+    strata = [cox['strata']] if isinstance(cox.get('strata'), str) else list(cox.get('strata') or [])
+    wcol = cox.get('weights_col')
+    cols = list(dict.fromkeys(covars + [c for c in (outcome, time, status, wcol) if c] + strata))
+    d = df.dropna(subset=cols).reset_index(drop=True)
+
+    spec = DesignSpec.from_frame(d, covars)
+    lspec, n_dense, _ = (logistic_design(d, covars, **(logistic or {})) if 'logistic' in models
+                         else (spec, None, 0))
+    if n_dense is None:
+        X = spec.transform(d)                          # logistic design (with const)
+        Xc = np.ascontiguousarray(X[:, 1:])            # Cox design (no intercept)
+        Xs, sparse_cols, absorbed = None, [], set()
+    else:
+        # dense covariates as before; high-cardinality and absorbed indicators as one CSR block
+        XL = lspec.transform_sparse(d).tocsc()
+        X, Xs = XL[:, :n_dense].toarray(), sparse.csr_matrix(XL[:, n_dense:])
+        sparse_cols = lspec.columns[n_dense:]
+        absorbed = {c for c in sparse_cols if c not in spec.columns}
+        Xc = spec.transform(d)[:, 1:] if 'cox' in models else None
+    terms = [c for c in spec.columns if c == exposure or c.startswith(f'{exposure}_')]
+    # columns each covariate (or absorbed variable) contributes, by name
+    levels = {**spec.levels, **lspec.levels}
+    names = list(dict.fromkeys(spec.columns + lspec.columns))
+    var_cols = {v: [c for c in names if c == v or (v in levels and c.startswith(f'{v}_'))] for v in variables}
+    shared = {
+        'X': X, 'Xc': Xc, 'logit_cols': spec.columns if n_dense is None else lspec.columns[:n_dense],
+        'cox_cols': spec.columns[1:], 'terms': terms,
+        'Xs': Xs, 'sparse_cols': sparse_cols, 'absorbed': absorbed,
+        'covars': covars, 'var_cols': var_cols, 'min_events': int(min_events),
+        'y': d[outcome].to_numpy(np.float64) if outcome else None,
+        't': d[time].to_numpy(np.float64) if time else None,
+        'e': d[status].to_numpy(np.float64) if status else None,
+        'groups': d[cluster].to_numpy() if cluster and cluster in d.columns else None,
+        'engine': cox.get('engine', 'lifelines'), 'ties': cox.get('ties', 'efron'),
+        'strata': d.groupby(strata, sort=True, observed=True).ngroup().to_numpy() if strata else None,
+        'strata_cols': strata,
+        'weights': d[wcol].to_numpy(np.float64) if wcol else None,
+        'exposure_design': DesignSpec([exposure], {k: v for k, v in spec.levels.items() if k == exposure},
+                                      add_const=False).transform(d),
+        'var_design': {}, 'var_rows': {},
+    }
+    tasks = []
+    for v in variables:
+        col = d[v]
+        shared['var_design'][v] = _indicator_design(col)
+        # one argsort groups all rows by level; each level is a contiguous run of row indices
+        cat = pd.Categorical(col)
+        codes, levels = cat.codes, cat.categories
+        order = np.argsort(codes, kind='stable')
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        shared['var_rows'][v] = np.flatnonzero(codes >= 0)
+        for run in np.split(order, bounds):
+            if len(run) and codes[run[0]] >= 0:
+                tasks += [('slice', (m, v, levels[codes[run[0]]], run)) for m in models]
+        tasks += [('interaction', (m, v)) for m in models]
+
+    if workers == 1:
+        _init_worker(shared)
+        results = [_dispatch(t) for t in tasks]
+    else:
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(shared,)) as pool:
+            results = list(pool.map(_dispatch, tasks, chunksize=4))
+    slices = pd.concat([r for r in results if isinstance(r, pd.DataFrame)], ignore_index=True)
+    inter = pd.DataFrame([r for r in results if isinstance(r, tuple)], columns=['model', 'variable', 'p_interaction'])
+    out = slices.merge(inter, on=['model', 'variable'], how='left')
+    return out.reindex(columns=FOREST_COLUMNS)
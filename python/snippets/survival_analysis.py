@@ -1,35 +1,111 @@
 # survival_analysis.py — lifelines survival helpers
 from __future__ import annotations
+import numpy as np
 import pandas as pd
-from lifelines import KaplanMeierFitter, CoxPHFitter
+from lifelines import CoxPHFitter
+from lifelines.statistics import proportional_hazard_test
 import matplotlib.pyplot as plt
 
-__all__ = ["km_fit_plot", "cox_fit", "hr_table"]
+from .coxph import FastCoxPH
+from .kaplan_meier import km_estimate
+from .logistic_regression import DesignSpec
 
-def km_fit_plot(df: pd.DataFrame, time: str, status: str, group: str | None = None):
-    kmf = KaplanMeierFitter()
+__all__ = ["km_fit_plot", "cox_fit", "cox_design", "cox_predict", "cox_ph_test", "hr_table"]
+
+def km_fit_plot(df: pd.DataFrame, time: str, status: str, group: str | None = None,
+                km: pd.DataFrame | None = None, ci: bool | None = None):
+    """KM curves (one per group level) from a single vectorised km_estimate.
+
+    km: a precomputed km_estimate table for these rows. ci defaults to shaded confidence
+    bands for up to 10 strata; the legend is drawn for up to 20.
+    """
+    if km is None:
+        strata = df[group] if group and group in df.columns else None
+        km = km_estimate(df[time], df[status], strata)
     fig, ax = plt.subplots(figsize=(6,4))
-    if group and group in df.columns:
-        for lvl, sub in df.groupby(group):
-            kmf.fit(sub[time], event_observed=sub[status], label=str(lvl))
-            kmf.plot_survival_function(ax=ax)
-    else:
-        kmf.fit(df[time], event_observed=df[status], label="overall")
-        kmf.plot_survival_function(ax=ax)
+    levels = km['stratum'].unique()
+    ci = len(levels) <= 10 if ci is None else ci
+    for lvl, sub in km.groupby('stratum', sort=False, observed=True):
+        # start every curve at (0, 1) and hold each value until the next time
+        t = np.r_[0.0, sub['time'].to_numpy()]
+        line, = ax.step(t, np.r_[1.0, sub['survival'].to_numpy()], where='post', label=str(lvl))
+        if ci:
+            ax.fill_between(t, np.r_[1.0, sub['ci_lower'].to_numpy()], np.r_[1.0, sub['ci_upper'].to_numpy()],
+                            step='post', alpha=0.25, color=line.get_color(), linewidth=0)
+    if len(levels) <= 20:
+        ax.legend()
     ax.set_title("Kaplan–Meier Survival")
     ax.set_xlabel("Time")
     ax.set_ylabel("Survival probability")
     plt.tight_layout()
     return ax
 
-def cox_fit(df: pd.DataFrame, duration_col: str, event_col: str, covariates: list[str]):
-    cph = CoxPHFitter()
-    cols = [duration_col, event_col] + covariates
-    cph.fit(df[cols].dropna(), duration_col=duration_col, event_col=event_col)
+def _as_list(cols) -> list[str]:
+    return [cols] if isinstance(cols, str) else list(cols or [])
+
+def cox_fit(df: pd.DataFrame, duration_col: str, event_col: str, covariates: list[str],
+            strata: str | list[str] | None = None, weights_col: str | None = None,
+            engine: str = 'lifelines', ties: str = 'efron', init=None):
+    """Cox PH model on the complete cases; categorical covariates are dummy-coded (DesignSpec).
+
+    engine='lifelines' fits CoxPHFitter (Efron ties only); engine='fast' fits FastCoxPH, which
+    takes sorted cumulative sums and handles 1M+ rows, with Efron or Breslow ties. Both
+    support strata, case weights and a warm start (init: coefficients or a previous fit),
+    and both carry design_info so cox_design/cox_predict/cox_ph_test encode new rows the
+    same way.
+    """
+    strata = _as_list(strata)
+    cols = list(dict.fromkeys([duration_col, event_col] + covariates + strata + _as_list(weights_col)))
+    d = df[cols].dropna()
+    spec = DesignSpec.from_frame(d, covariates, add_const=False)
+    info = {'columns': spec.columns, 'spec': spec, 'duration_col': duration_col, 'event_col': event_col,
+            'strata': strata, 'weights_col': weights_col}
+    if hasattr(init, 'params_'):
+        init = init.params_.reindex(spec.columns).fillna(0.0).to_numpy()
+    if engine == 'fast':
+        cph = FastCoxPH(ties).fit(spec.frame(d), d[duration_col], d[event_col], strata=_strata_codes(d, strata),
+                                  weights=d[weights_col] if weights_col else None, init=init)
+    elif engine == 'lifelines':
+        if (ties or 'efron').lower() != 'efron':
+            raise ValueError("lifelines supports Efron ties only; use engine='fast' for Breslow")
+        X = spec.frame(d)
+        start = None if init is None else np.asarray(init, dtype=np.float64) * X.std(0).to_numpy()
+        cph = CoxPHFitter().fit(_design(X, d, info), duration_col=duration_col, event_col=event_col,
+                                strata=strata or None, weights_col=weights_col, initial_point=start)
+    else:
+        raise ValueError("cox engine must be one of: lifelines | fast")
+    cph.design_info = info
     return cph
 
-def hr_table(cph: CoxPHFitter) -> pd.DataFrame:
-    s = cph.summary.reset_index().rename(columns={"index":"term"})
+def _strata_codes(d: pd.DataFrame, strata: list[str]):
+    return d.groupby(strata, sort=True, observed=True).ngroup().to_numpy() if strata else None
+
+def _design(X: pd.DataFrame, d: pd.DataFrame, info: dict) -> pd.DataFrame:
+    extra = [info['duration_col'], info['event_col']] + info['strata'] + _as_list(info['weights_col'])
+    return pd.concat([X, d[[c for c in extra if c in d.columns]]], axis=1)
+
+def cox_design(cph, df: pd.DataFrame) -> pd.DataFrame:
+    """df as the model saw it: encoded covariates plus duration/event/strata/weight columns."""
+    return _design(cph.design_info['spec'].frame(df), df, cph.design_info)
+
+def cox_predict(cph, df: pd.DataFrame) -> np.ndarray:
+    """Log partial hazard of raw rows (covariates encoded as at fit time)."""
+    return np.asarray(cph.predict_log_partial_hazard(cph.design_info['spec'].frame(df)))
+
+def cox_ph_test(cph, df: pd.DataFrame) -> pd.DataFrame:
+    """Scaled-Schoenfeld PH test (rank time transform) per term on the fitted rows."""
+    info = cph.design_info
+    d = df.dropna(subset=[info['duration_col'], info['event_col']] + info['spec'].covariates
+                  + info['strata'] + _as_list(info['weights_col']))
+    if isinstance(cph, FastCoxPH):
+        w = info['weights_col']
+        return cph.ph_test(info['spec'].frame(d), d[info['duration_col']], d[info['event_col']],
+                           strata=_strata_codes(d, info['strata']), weights=d[w] if w else None)
+    res = proportional_hazard_test(cph, cox_design(cph, d), time_transform='rank')
+    return res.summary.reset_index().rename(columns={'index': 'term'})[['term', 'test_statistic', 'p']]
+
+def hr_table(cph) -> pd.DataFrame:
+    s = cph.summary.rename_axis("term").reset_index()
     out = s[["term","exp(coef)","exp(coef) lower 95%","exp(coef) upper 95%","p"]].copy()
     out.columns = ["term","HR","CI_lower","CI_upper","p_value"]
     return out
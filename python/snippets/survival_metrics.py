@@ -0,0 +1,165 @@
+# survival_metrics.py — fast discrimination metrics for survival models (Harrell's C, Uno's C, AUC(t))
+from __future__ import annotations
+import numpy as np
+from typing import Sequence
+
+__all__ = ["harrell_c", "uno_c", "cumulative_dynamic_auc", "censoring_survival"]
+
+# All metrics take a risk score where higher = earlier event (e.g. the Cox linear predictor,
+# cph.predict_log_partial_hazard). Pair counting is O(n log^2 n) in NumPy: instead of a
+# Python-level Fenwick tree swept over time, the sweep is unrolled into log2(#times) levels;
+# at each level every event in the left half of a time block is matched against the right
+# half through one sort by risk and one cumulative sum of weights, so the per-element work is
+# vectorised. Weights may be (n,) or (n, B), the latter scoring B bootstrap resamples at once.
+
+def _ranks(x: np.ndarray) -> np.ndarray:
+    return np.unique(x, return_inverse=True)[1].ravel()
+
+def _as_weights(w, n: int) -> np.ndarray:
+    """(n, B) float64 weights; None → ones."""
+    if w is None:
+        return np.ones((n, 1))
+    w = np.asarray(w, dtype=np.float64)
+    # C order: the counting gathers whole rows
+    return w[:, None] if w.ndim == 1 else np.ascontiguousarray(w)
+
+def _group_sum(W, g, idx, n_groups):
+    """Per time group sums of W[idx] → (n_groups, B) (sort + reduceat; np.add.at is slow)."""
+    out = np.zeros((n_groups, W.shape[1]))
+    if len(idx):
+        o = idx[np.argsort(g[idx], kind="stable")]
+        starts = np.flatnonzero(np.r_[True, g[o][1:] != g[o][:-1]])
+        out[g[o][starts]] = np.add.reduceat(W[o], starts, axis=0)
+    return out
+
+def _cross_counts(WR, blk, r, L, R, r_max):
+    """Weights of R-rows in the same blk with lower / equal r, for each L-row.
+
+    L and R are sorted together by (blk, r) with L first among equal keys, so a running sum
+    of R weights read at an L-row is the weight below it (minus the sum at its block start),
+    and read at the end of its run of equal keys adds the ties; no binary searches needed.
+    Returns (L rows in sorted order, less, tie).
+    """
+    idx = np.concatenate([L, R])
+    keys = blk[idx] * (r_max + 1) + r[idx]
+    o = np.argsort(keys, kind="stable")
+    keys, idx, is_r = keys[o], idx[o], o >= len(L)
+    m = len(idx)
+    cw = np.zeros((len(R) + 1, WR.shape[1]))
+    np.cumsum(WR[idx[is_r]], axis=0, out=cw[1:])
+    n_r = np.r_[0, np.cumsum(is_r)]                # R rows before each sorted position
+    pos = np.arange(m)
+    b = blk[idx]
+    blk_start = np.maximum.accumulate(np.where(np.r_[True, b[1:] != b[:-1]], pos, 0))
+    run_next = np.where(np.r_[keys[1:] != keys[:-1], True], pos + 1, m)
+    run_end = np.minimum.accumulate(run_next[::-1])[::-1]
+    lp = np.flatnonzero(~is_r)
+    c = cw[n_r[lp]]
+    return idx[lp], c - cw[n_r[blk_start[lp]]], cw[n_r[run_end[lp]]] - c
+
+def _concordance(g, r, left, right, WL, WR, same_time=None):
+    """Weighted concordance ratio over comparable pairs, per weight column.
+
+    Pairs (i, j) with i in left, j in right and time group g_j > g_i, weighted WL_i * WR_j;
+    concordant if r_i > r_j, half if tied. same_time (a mask of j) adds pairs with g_j == g_i.
+    """
+    n_groups, r_max = int(g.max()) + 1, int(r.max())
+    num = np.zeros(WL.shape[1])
+    h = 1
+    while h < n_groups:
+        blk, upper = g // (2 * h), (g // h) % 2 == 1
+        L, R = np.flatnonzero(left & ~upper), np.flatnonzero(right & upper)
+        if len(L) and len(R):
+            Ls, less, tie = _cross_counts(WR, blk, r, L, R, r_max)
+            num += np.einsum("ij,ij->j", less + 0.5 * tie, WL[Ls])
+        h *= 2
+    # comparable weight: right-side weight in strictly later time groups
+    Wg = _group_sum(WR, g, np.flatnonzero(right), n_groups)
+    later = Wg.sum(0) - np.cumsum(Wg, axis=0)
+    L = np.flatnonzero(left)
+    den = np.einsum("ij,ij->j", later[g[L]], WL[L])
+    if same_time is not None:
+        R = np.flatnonzero(same_time)
+        if len(L) and len(R):
+            Ls, less, tie = _cross_counts(WR, g, r, L, R, r_max)
+            num += np.einsum("ij,ij->j", less + 0.5 * tie, WL[Ls])
+            Ws = _group_sum(WR, g, R, n_groups)
+            den += np.einsum("ij,ij->j", Ws[g[L]], WL[L])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return num / den
+
+def harrell_c(time, event, risk, weights=None) -> float | np.ndarray:
+    """Harrell's concordance index, matching lifelines.utils.concordance_index(time, -risk, event).
+
+    Comparable pairs: the earlier time is an event, or an event ties with a censored time
+    (the censored subject outlived it). Tied risks count 1/2. weights: per-row frequency
+    weights (n,) or (n, B) for B resamples; a 2-D input returns B values.
+    """
+    t = np.asarray(time, dtype=np.float64)
+    ev = np.asarray(event).astype(bool)
+    W = _as_weights(weights, len(t))
+    g, r = _ranks(t), _ranks(np.asarray(risk, dtype=np.float64))
+    c = _concordance(g, r, ev, np.ones(len(t), bool), W, W, same_time=~ev)
+    return c if np.ndim(weights) == 2 else float(c[0])
+
+def censoring_survival(time, event, at=None, left_limit: bool = True) -> np.ndarray:
+    """Kaplan–Meier estimate G of the censoring distribution, evaluated at `at` (default: time).
+
+    left_limit=True returns G(t−), the probability of remaining uncensored just before t.
+    """
+    t = np.asarray(time, dtype=np.float64)
+    cens = ~np.asarray(event).astype(bool)
+    ut, inv = np.unique(t, return_inverse=True)
+    n_c = np.bincount(inv.ravel(), weights=cens, minlength=len(ut))
+    at_risk = len(t) - np.r_[0, np.cumsum(np.bincount(inv.ravel(), minlength=len(ut)))[:-1]]
+    G = np.cumprod(1.0 - n_c / at_risk)
+    q = t if at is None else np.asarray(at, dtype=np.float64)
+    idx = np.searchsorted(ut, q, side="left" if left_limit else "right") - 1
+    return np.where(idx >= 0, G[np.clip(idx, 0, None)], 1.0)
+
+def _ipcw(time, event, train_time, train_event):
+    if train_time is None:
+        train_time, train_event = time, event
+    G = censoring_survival(train_time, train_event, at=time)
+    with np.errstate(divide="ignore"):
+        return np.where(G > 0, 1.0 / G, 0.0)
+
+def uno_c(time, event, risk, tau: float | None = None, train_time=None, train_event=None) -> float:
+    """Uno's IPCW concordance, truncated at tau (default: largest event time).
+
+    Each comparable pair (T_i < T_j, event at T_i < tau) is weighted by 1/G(T_i−)^2, with G
+    the censoring KM from the training data (default: the same data), which removes the
+    dependence of Harrell's C on the censoring distribution.
+    """
+    t = np.asarray(time, dtype=np.float64)
+    ev = np.asarray(event).astype(bool)
+    if tau is None:
+        tau = t[ev].max() if ev.any() else np.inf
+    w = _ipcw(t, ev, train_time, train_event) ** 2
+    left = ev & (t < tau)
+    g, r = _ranks(t), _ranks(np.asarray(risk, dtype=np.float64))
+    return float(_concordance(g, r, left, np.ones(len(t), bool), w[:, None], np.ones((len(t), 1)))[0])
+
+def cumulative_dynamic_auc(time, event, risk, horizons: Sequence[float],
+                           train_time=None, train_event=None) -> np.ndarray:
+    """Cumulative/dynamic AUC(t) for each horizon t (Uno et al. 2007).
+
+    Cases: events with T_i <= t, weighted by 1/G(T_i−); controls: T_j > t. AUC(t) is the
+    weighted probability that a case has a higher risk than a control (ties count 1/2).
+    All horizons are evaluated together from one sort of the risk scores.
+    """
+    t = np.asarray(time, dtype=np.float64)
+    ev = np.asarray(event).astype(bool)
+    hz = np.atleast_1d(np.asarray(horizons, dtype=np.float64))
+    w = _ipcw(t, ev, train_time, train_event)
+    order = np.argsort(np.asarray(risk, dtype=np.float64), kind="stable")
+    rs = np.asarray(risk, dtype=np.float64)[order]
+    starts = np.flatnonzero(np.r_[True, rs[1:] != rs[:-1]])      # risk tie groups
+    ts, es, ws = t[order], ev[order], w[order]
+    case = (ts[None, :] <= hz[:, None]) & es[None, :]               # (H, n)
+    ctrl = ts[None, :] > hz[:, None]
+    P = np.add.reduceat(np.where(case, ws[None, :], 0.0), starts, axis=1)
+    N = np.add.reduceat(ctrl.astype(np.float64), starts, axis=1)
+    below = np.cumsum(N, axis=1) - N                                # controls with lower risk
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (P * (below + 0.5 * N)).sum(1) / (P.sum(1) * N.sum(1))